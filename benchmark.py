@@ -0,0 +1,293 @@
+#!/usr/bin/python3
+
+__author__ = 'borozdin'
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import numpy
+from PyQt5 import QtGui
+import catalog
+import catalog_cache
+import geometry
+import gl_renderer
+import incremental_projection
+import level_of_detail
+import parser
+import pick_index
+import projection_cache
+import renderer
+
+
+REAL_CATALOG_PATH = "stars/"
+SYNTHETIC_SIZES = (10000, 100000, 1000000)
+FRAMES_COUNT = 120
+PICKS_COUNT = 200
+SCREEN_SIDE = 800
+STAR_RADIUS = 2
+PICK_RADIUS = 10
+CONSTELLATIONS_COUNT = 88
+SPECTRAL_CLASSES = "OBAFGKM"
+
+
+def generate_catalog(count, seed=0):
+    # stars are spread evenly over the sky and get fainter the way a real
+    # sky does, the number of stars brighter than a magnitude grows by
+    # the factor of ten every two magnitudes
+    generator = numpy.random.RandomState(seed)
+    points = generator.normal(size=(count, 3))
+    points /= numpy.sqrt((points ** 2).sum(axis=1))[:, numpy.newaxis]
+
+    faintest = 6.5 + 2 * math.log10(max(1, count) / 3000)
+    brightness = numpy.sort(numpy.maximum(
+        faintest + 2 * numpy.log10(generator.uniform(0, 1, count) + 1e-12),
+        -1.5))
+
+    classes = numpy.frombuffer(SPECTRAL_CLASSES.encode(), dtype=numpy.uint8)
+    colors = classes[generator.randint(0, len(classes), count)]
+    constellation_ids = generator.randint(
+        0, CONSTELLATIONS_COUNT, count).astype(numpy.int16)
+    constellation_names = ["C" + str(constellation_id) for constellation_id
+                           in range(0, CONSTELLATIONS_COUNT)]
+
+    latitudes = numpy.degrees(numpy.arcsin(numpy.clip(points[:, 2], -1, 1)))
+    longitudes = numpy.degrees(numpy.arctan2(points[:, 1], points[:, 0]))
+    coordinates = numpy.column_stack((
+        numpy.round(longitudes / 15 * 36000) % (24 * 36000),
+        numpy.round(latitudes * 3600))).astype(numpy.int32)
+
+    return catalog.Catalog(points, brightness, colors, constellation_ids,
+                           constellation_names, coordinates)
+
+
+def get_camera_paths(frames_count=FRAMES_COUNT):
+    # every path is a list of arguments of ViewArea.move, one per frame
+    paths = {
+        "pan": [(0, 0.01, 0, 0)] * frames_count,
+        "drag": [(0.02 * math.sin(frame / 10), 0.02 * math.cos(frame / 10),
+                  0, 0) for frame in range(0, frames_count)],
+        "roll": [(0, 0, 0.03, 0)] * frames_count,
+        # zooming in shows fainter stars, so this path draws the most
+        "zoom": [(0, 0, 0, -0.04 if frame < frames_count // 2 else 0.04)
+                 for frame in range(0, frames_count)],
+        "fly": [(0.05, 0.03, 0.01, 0.01 * (-1) ** (frame // 20))
+                for frame in range(0, frames_count)],
+        # dragging back and forth over the same views
+        "swing": [(0, 0.02 * (-1) ** (frame // 10), 0, 0)
+                  for frame in range(0, frames_count)],
+    }
+    return paths
+
+
+def get_statistics(durations):
+    milliseconds = numpy.array(durations) * 1000
+    if not len(milliseconds):
+        return {"count": 0}
+    return {
+        "count": len(milliseconds),
+        "total_ms": float(milliseconds.sum()),
+        "mean_ms": float(milliseconds.mean()),
+        "median_ms": float(numpy.median(milliseconds)),
+        "p95_ms": float(numpy.percentile(milliseconds, 95)),
+        "max_ms": float(milliseconds.max()),
+    }
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def convert_to_screen(points2d, side=SCREEN_SIDE):
+    return points2d * (side / 2) + side / 2
+
+
+def render_frame(image, stars2d, view_area):
+    image.fill(0)
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    renderer.draw_stars(
+        painter, convert_to_screen(stars2d.points),
+        renderer.get_star_levels(
+            stars2d, view_area.get_brightness_threshold()),
+        stars2d.color_classes, STAR_RADIUS)
+    painter.end()
+
+
+def benchmark_parsing(root_path, processes=None):
+    stars3d, parse_duration = measure(
+        parser.parse_catalog, root_path, processes)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, catalog_cache.CACHE_FILE_NAME)
+        _, write_duration = measure(
+            catalog_cache.write_cache, cache_path, root_path, stars3d)
+        _, read_duration = measure(
+            catalog_cache.read_cache, cache_path, root_path)
+
+    stages = {
+        "parse": get_statistics([parse_duration]),
+        "cache_write": get_statistics([write_duration]),
+        "cache_read": get_statistics([read_duration]),
+    }
+    return stars3d, stages
+
+
+def benchmark_path(stars3d, detail, moves, picks_count=PICKS_COUNT,
+                   render=True, seed=0):
+    generator = numpy.random.RandomState(seed)
+    projection = incremental_projection.IncrementalProjection(
+        stars3d, detail)
+    cache = projection_cache.ProjectionCache(
+        incremental_projection.IncrementalProjection(
+            stars3d, detail).project, screen_side=SCREEN_SIDE)
+    view_area = geometry.ViewArea(geometry.Vector3D(0, 0, 1),
+                                  geometry.Vector3D(0, 1, 0), math.pi / 5)
+    image = QtGui.QImage(SCREEN_SIDE, SCREEN_SIDE,
+                         QtGui.QImage.Format_ARGB32_Premultiplied)
+
+    durations = {"move": [], "projection": [], "cached_projection": [],
+                 "full_projection": [], "opengl_frame": [], "pick_index": [],
+                 "pick": [], "render": []}
+    drawn_counts = []
+    for move in moves:
+        _, duration = measure(view_area.move, *move)
+        durations["move"].append(duration)
+
+        stars2d, duration = measure(projection.project, view_area)
+        durations["projection"].append(duration)
+        drawn_counts.append(len(stars2d))
+
+        _, duration = measure(cache.project, view_area, stars3d.version)
+        durations["cached_projection"].append(duration)
+
+        _, duration = measure(geometry.project_visible_points,
+                              stars3d, view_area, None, detail)
+        durations["full_projection"].append(duration)
+
+        # the CPU side of an OpenGL frame, the shader does the rest
+        _, duration = measure(gl_renderer.get_frame_parameters,
+                              stars3d, view_area, SCREEN_SIDE, SCREEN_SIDE)
+        durations["opengl_frame"].append(duration)
+
+        screen_points = convert_to_screen(stars2d.points)
+        index, duration = measure(
+            pick_index.PickIndex, screen_points, PICK_RADIUS)
+        durations["pick_index"].append(duration)
+        clicks = generator.uniform(0, SCREEN_SIDE, (picks_count, 2)).tolist()
+        start = time.perf_counter()
+        for x, y in clicks:
+            index.get_nearest(x, y)
+        durations["pick"].append(
+            (time.perf_counter() - start) / max(1, picks_count))
+
+        if render:
+            _, duration = measure(render_frame, image, stars2d, view_area)
+            durations["render"].append(duration)
+
+    result = {name: get_statistics(values)
+              for name, values in durations.items()}
+    result["drawn_stars"] = {
+        "mean": float(numpy.mean(drawn_counts)) if drawn_counts else 0,
+        "max": int(max(drawn_counts, default=0))}
+    result["queries"] = projection.queries_count
+    result["projection_cache"] = {
+        "hits": cache.hits_count, "misses": cache.misses_count,
+        "bytes": cache.memory_usage}
+    return result
+
+
+def benchmark_catalog(name, stars3d, paths, render=True, stages=None):
+    detail, detail_duration = measure(
+        level_of_detail.LevelOfDetail, stars3d)
+    stages = dict(stages or {})
+    stages["level_of_detail"] = get_statistics([detail_duration])
+
+    return {
+        "catalog": name,
+        "stars": len(stars3d),
+        "stages": stages,
+        "paths": {path_name: benchmark_path(stars3d, detail, moves,
+                                            render=render)
+                  for path_name, moves in paths.items()},
+    }
+
+
+def run_benchmarks(sizes=SYNTHETIC_SIZES, real_path=REAL_CATALOG_PATH,
+                   frames_count=FRAMES_COUNT, path_names=None, render=True,
+                   processes=None, seed=0):
+    paths = get_camera_paths(frames_count)
+    if path_names is not None:
+        paths = {name: paths[name] for name in path_names}
+
+    results = []
+    if real_path is not None:
+        stars3d, stages = benchmark_parsing(real_path, processes)
+        results.append(benchmark_catalog(
+            "real", stars3d, paths, render, stages))
+    for size in sizes:
+        stars3d, duration = measure(generate_catalog, size, seed)
+        results.append(benchmark_catalog(
+            "synthetic", stars3d, paths, render,
+            {"generate": get_statistics([duration])}))
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": numpy.__version__,
+        "frames": frames_count,
+        "results": results,
+    }
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description="Time parsing, projection, picking and rendering "
+                    "without a window and print the results as JSON.")
+    argument_parser.add_argument(
+        "--sizes", type=int, nargs="*", default=list(SYNTHETIC_SIZES),
+        help="numbers of stars of synthetic catalogs")
+    argument_parser.add_argument(
+        "--real", default=REAL_CATALOG_PATH,
+        help="directory of the real catalog")
+    argument_parser.add_argument(
+        "--no-real", action="store_true", help="skip the real catalog")
+    argument_parser.add_argument(
+        "--frames", type=int, default=FRAMES_COUNT,
+        help="number of frames of every camera path")
+    argument_parser.add_argument(
+        "--paths", nargs="*", choices=sorted(get_camera_paths(1)),
+        help="camera paths to replay, all by default")
+    argument_parser.add_argument(
+        "--no-render", action="store_true", help="skip offscreen rendering")
+    argument_parser.add_argument(
+        "--processes", type=int, help="processes for parsing")
+    argument_parser.add_argument("--seed", type=int, default=0)
+    argument_parser.add_argument(
+        "--output", help="file for the results instead of standard output")
+    arguments = argument_parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    application = QtGui.QGuiApplication(sys.argv[:1])
+
+    results = run_benchmarks(
+        arguments.sizes, None if arguments.no_real else arguments.real,
+        arguments.frames, arguments.paths, not arguments.no_render,
+        arguments.processes, arguments.seed)
+
+    text = json.dumps(results, indent=2)
+    if arguments.output is None:
+        print(text)
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(text + "\n")
+    del application
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+__author__ = 'borozdin'
+
+import array
+import itertools
+import math
+import numpy
+import geometry
+import sky_index
+import star
+
+
+VERSIONS = itertools.count()
+
+
+def format_tooltip(right_ascension, declination):
+    seconds = abs(declination)
+    return "Alf: {}:{}:{:.1f}\nDel: {}{:02}:{}:{}".format(
+        right_ascension // 36000, right_ascension // 600 % 60,
+        right_ascension % 600 / 10,
+        "-" if declination < 0 else "+",
+        seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def get_catalog_coordinates(point3d):
+    latitude, longitude = point3d.convert_to_spherical_coordinates()
+    return (round(longitude / 15 * 36000) % (24 * 36000),
+            round(latitude * 3600))
+
+
+def get_constellation_caps(points, order, starts):
+    # the centre of a cap is the normalized sum of the stars, its radius is
+    # the angle to the farthest of them; constellations without stars get
+    # a zero centre
+    counts = numpy.diff(starts)
+    present = counts > 0
+    centers = numpy.zeros((len(counts), 3))
+    radii = numpy.zeros(len(counts))
+    if not len(order):
+        return centers, radii
+
+    sums = numpy.add.reduceat(points[order], starts[:-1][present])
+    lengths = numpy.sqrt((sums ** 2).sum(axis=1))
+    centers[present] = sums / numpy.maximum(lengths, geometry.EPSILON)[
+        :, numpy.newaxis]
+
+    member_ids = numpy.repeat(numpy.arange(len(counts)), counts)
+    cosines = (points[order] * centers[member_ids]).sum(axis=1)
+    radii[present] = numpy.arccos(numpy.clip(numpy.minimum.reduceat(
+        cosines, starts[:-1][present]), -1, 1))
+    return centers, radii
+
+
+class CatalogBuilder:
+    # collects stars one by one into compact arrays, so big catalogs never
+    # exist as lists of Python objects
+    def __init__(self):
+        self.points = array.array("d")
+        self.brightness = array.array("d")
+        self.colors = array.array("B")
+        self.constellation_ids = array.array("h")
+        self.constellation_names = []
+        self.known_constellations = {}
+        self.coordinates = array.array("i")
+        self.color_indices = array.array("f")
+
+    def get_constellation_id(self, constellation):
+        if constellation not in self.known_constellations:
+            self.known_constellations[constellation] = len(
+                self.constellation_names)
+            self.constellation_names.append(constellation)
+        return self.known_constellations[constellation]
+
+    def add(self, point3d, brightness, color, constellation, coordinates,
+            color_index=math.nan):
+        self.points.extend((point3d.x, point3d.y, point3d.z))
+        self.brightness.append(brightness)
+        self.colors.append(ord(color))
+        self.constellation_ids.append(
+            self.get_constellation_id(constellation))
+        self.coordinates.extend(coordinates)
+        self.color_indices.append(color_index)
+
+    def extend(self, other):
+        renumbering = [self.get_constellation_id(constellation)
+                       for constellation in other.constellation_names]
+
+        self.points.extend(other.points)
+        self.brightness.extend(other.brightness)
+        self.colors.extend(other.colors)
+        self.constellation_ids.extend(
+            renumbering[constellation_id]
+            for constellation_id in other.constellation_ids)
+        self.coordinates.extend(other.coordinates)
+        self.color_indices.extend(other.color_indices)
+
+    def __len__(self):
+        return len(self.brightness)
+
+    def build(self):
+        brightness = numpy.frombuffer(self.brightness, dtype=numpy.float64)
+        order = numpy.argsort(brightness, kind="stable")
+
+        constellation_names = sorted(self.constellation_names)
+        renumbering = numpy.array(
+            [constellation_names.index(name)
+             for name in self.constellation_names], dtype=numpy.int16)
+        constellation_ids = numpy.frombuffer(
+            self.constellation_ids, dtype=numpy.int16)
+
+        return Catalog(
+            numpy.frombuffer(self.points, dtype=numpy.float64).reshape(
+                -1, 3)[order],
+            brightness[order],
+            numpy.frombuffer(self.colors, dtype=numpy.uint8)[order],
+            renumbering[constellation_ids[order]],
+            constellation_names,
+            numpy.frombuffer(self.coordinates, dtype=numpy.int32).reshape(
+                -1, 2)[order],
+            numpy.frombuffer(self.color_indices, dtype=numpy.float32)[order])
+
+
+class Catalog:
+    # stars must go from the brightest to the faintest, so a magnitude cut
+    # is a prefix; coordinates keep tenths of seconds of right ascension and
+    # seconds of declination as the catalog writes them; colour indices
+    # are B-V, NaN where unknown
+    def __init__(self, points, brightness, colors, constellation_ids,
+                 constellation_names, coordinates, color_indices=None):
+        self.points = points
+        self.brightness = brightness
+        self.colors = colors
+        self.constellation_ids = constellation_ids
+        self.constellation_names = constellation_names
+        self.coordinates = coordinates
+        if color_indices is None:
+            color_indices = numpy.full(len(brightness), numpy.nan,
+                                       dtype=numpy.float32)
+        self.color_indices = color_indices
+        self.index = sky_index.SkyIndex(self.points, self.brightness)
+        # results computed for one catalog are never taken for another
+        self.version = next(VERSIONS)
+
+        # everything the renderer needs of a star but its position
+        self.color_classes = star.get_color_classes(colors, color_indices)
+        self.intensities, self.intensity_magnitudes = \
+            star.get_intensities(brightness)
+
+        # stars of every constellation are a contiguous run of this order,
+        # still from the brightest to the faintest
+        self.constellation_order = numpy.argsort(
+            constellation_ids, kind="stable")
+        self.constellation_starts = numpy.searchsorted(
+            constellation_ids[self.constellation_order],
+            numpy.arange(len(constellation_names) + 1))
+        self.constellation_centers, self.constellation_radii = \
+            get_constellation_caps(points, self.constellation_order,
+                                   self.constellation_starts)
+        self.enclosing_caps = {}
+        self.coordinate_indices = None
+
+    @staticmethod
+    def from_stars(stars):
+        builder = CatalogBuilder()
+        for star3d in stars:
+            builder.add(star3d.point, star3d.brightness, star3d.color,
+                        star3d.constellation,
+                        get_catalog_coordinates(star3d.point))
+        return builder.build()
+
+    def get_constellation_id(self, constellation):
+        if constellation not in self.constellation_names:
+            return None
+        return self.constellation_names.index(constellation)
+
+    def get_constellation_name(self, constellation_id):
+        return self.constellation_names[constellation_id]
+
+    def get_constellation_indices(self, constellation_id):
+        return self.constellation_order[
+            self.constellation_starts[constellation_id]:
+            self.constellation_starts[constellation_id + 1]]
+
+    def get_constellation_cap(self, constellation_id):
+        return (geometry.Vector3D(
+                    *self.constellation_centers[constellation_id].tolist()),
+                float(self.constellation_radii[constellation_id]))
+
+    def get_enclosing_cap(self, constellation_id):
+        # the smallest cap is found on demand, constellations spread over
+        # more than a hemisphere keep their bounding cap
+        if constellation_id not in self.enclosing_caps:
+            cap = geometry.get_smallest_enclosing_cap(self.points[
+                self.get_constellation_indices(constellation_id)])
+            if cap is None:
+                cap = self.get_constellation_cap(constellation_id)
+            self.enclosing_caps[constellation_id] = cap
+        return self.enclosing_caps[constellation_id]
+
+    def find_star(self, constellation_id, coordinates):
+        # stars of the source files are found by their constellation and
+        # catalog coordinates; the first, brightest, star wins a tie
+        if self.coordinate_indices is None:
+            self.coordinate_indices = {}
+            for index, (star_constellation_id, star_coordinates) in \
+                    enumerate(zip(self.constellation_ids.tolist(),
+                                  self.coordinates.tolist())):
+                self.coordinate_indices.setdefault(
+                    (star_constellation_id,) + tuple(star_coordinates),
+                    index)
+        return self.coordinate_indices.get(
+            (constellation_id,) + tuple(coordinates))
+
+    def get_point3d(self, index):
+        return geometry.Vector3D(*self.points[index].tolist())
+
+    def get_tooltip(self, index):
+        return format_tooltip(*self.coordinates[index].tolist())
+
+    def get_bright_count(self, brightness_threshold):
+        return numpy.searchsorted(
+            self.brightness, brightness_threshold, side="right")
+
+    def __len__(self):
+        return len(self.brightness)
+
+    def __iter__(self):
+        for index in range(0, len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        return star.Star(
+            self.get_point3d(index),
+            float(self.brightness[index]),
+            chr(self.colors[index]),
+            self.get_constellation_name(self.constellation_ids[index]),
+            self.get_tooltip(index))
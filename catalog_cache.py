@@ -0,0 +1,154 @@
+__author__ = 'borozdin'
+
+import hashlib
+import json
+import os
+import struct
+import numpy
+import catalog
+import parser
+
+
+CACHE_FILE_NAME = "catalog.cache"
+MAGIC = b"SKYCACHE"
+VERSION = 3
+PREFIX_FORMAT = "<8sII"
+ALIGNMENT = 16
+
+COLUMNS = (
+    ("points", numpy.float64),
+    ("brightness", numpy.float64),
+    ("colors", numpy.uint8),
+    ("constellation_ids", numpy.int16),
+    ("coordinates", numpy.int32),
+    ("color_indices", numpy.float32),
+)
+
+
+def get_file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def describe_sources(root_path):
+    sources = {}
+    for file in parser.get_source_files(root_path):
+        status = os.stat(root_path + file)
+        sources[file] = {
+            "mtime": status.st_mtime_ns,
+            "size": status.st_size,
+            "sha1": get_file_hash(root_path + file),
+        }
+    return sources
+
+
+def are_sources_unchanged(root_path, sources):
+    files = parser.get_source_files(root_path)
+    if files != sorted(sources):
+        return False
+
+    for file in files:
+        status = os.stat(root_path + file)
+        source = sources[file]
+        if (status.st_mtime_ns == source["mtime"] and
+                status.st_size == source["size"]):
+            continue
+        # the file was touched, but it may still have the same content
+        if get_file_hash(root_path + file) != source["sha1"]:
+            return False
+    return True
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_cache(path, root_path, stars3d):
+    arrays = {
+        "points": stars3d.points,
+        "brightness": stars3d.brightness,
+        "colors": stars3d.colors,
+        "constellation_ids": stars3d.constellation_ids,
+        "coordinates": stars3d.coordinates,
+        "color_indices": stars3d.color_indices,
+    }
+
+    header = {
+        "sources": describe_sources(root_path),
+        "constellations": list(stars3d.constellation_names),
+        "columns": {},
+    }
+    # column offsets do not depend on the header, so they are counted from
+    # the start of the data section
+    offset = 0
+    for name, dtype in COLUMNS:
+        array = numpy.ascontiguousarray(arrays[name], dtype=dtype)
+        arrays[name] = array
+        header["columns"][name] = {"shape": list(array.shape),
+                                   "offset": offset}
+        offset = align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = align(struct.calcsize(PREFIX_FORMAT) + len(header_bytes))
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(struct.pack(
+            PREFIX_FORMAT, MAGIC, VERSION, len(header_bytes)))
+        file.write(header_bytes)
+        for name, dtype in COLUMNS:
+            file.seek(data_start + header["columns"][name]["offset"])
+            file.write(arrays[name].tobytes())
+        file.truncate(data_start + offset)
+    os.replace(temporary_path, path)
+
+
+def map_column(path, dtype, offset, shape):
+    if numpy.prod(shape) == 0:
+        return numpy.zeros(shape, dtype=dtype)
+    return numpy.memmap(path, dtype=dtype, mode="r", offset=offset,
+                        shape=tuple(shape))
+
+
+def read_cache(path, root_path):
+    with open(path, "rb") as file:
+        prefix = file.read(struct.calcsize(PREFIX_FORMAT))
+        if len(prefix) != struct.calcsize(PREFIX_FORMAT):
+            return None
+        magic, version, header_length = struct.unpack(PREFIX_FORMAT, prefix)
+        if magic != MAGIC or version != VERSION:
+            return None
+        header = json.loads(file.read(header_length).decode("utf-8"))
+
+    if not are_sources_unchanged(root_path, header["sources"]):
+        return None
+
+    data_start = align(struct.calcsize(PREFIX_FORMAT) + header_length)
+    columns = {}
+    for name, dtype in COLUMNS:
+        column = header["columns"][name]
+        columns[name] = map_column(
+            path, dtype, data_start + column["offset"], column["shape"])
+
+    return catalog.Catalog(
+        columns["points"], columns["brightness"], columns["colors"],
+        columns["constellation_ids"], header["constellations"],
+        columns["coordinates"], columns["color_indices"])
+
+
+def load_catalog(root_path, processes=None):
+    path = root_path + CACHE_FILE_NAME
+
+    try:
+        stars3d = read_cache(path, root_path)
+    except (OSError, ValueError, KeyError):
+        stars3d = None
+    if stars3d is not None:
+        return stars3d
+
+    stars3d = parser.parse_catalog(root_path, processes)
+    try:
+        write_cache(path, root_path, stars3d)
+    except OSError:
+        pass
+    return stars3d
@@ -3,17 +3,36 @@
 __author__ = 'borozdin'
 
 from PyQt5 import Qt, QtCore, QtGui, QtWidgets
-import parser
+import catalog_cache
+import frame_scheduler
+import gl_renderer
+import incremental_projection
+import instrumentation
+import ingestion
+import level_of_detail
 import sys
 import geometry
 import popup_window
+import projection_cache
+import projection_worker
+import search_index
 import search_window
+import star_details
 import math
+import os
+import time
+import pick_index
+import renderer
 
 
 STAR_RADIUS = 2
 CLICK_TOLERANCE = 5
 STAR_SELECTION_RADIUS = STAR_RADIUS * 5
+FLY_TO_DURATION = 0.6
+HUD_FONT_SIZE = 9
+TRACE_VARIABLE = "SKY_OF_STARS_TRACE"
+RENDERER_VARIABLE = "SKY_OF_STARS_RENDERER"
+OPENGL_RENDERER = "opengl"
 
 HELP_TEXT = (
     "<h3>Keyboard controls:</h3>"
@@ -26,6 +45,7 @@ HELP_TEXT = (
     "<b>R</b> - zoom closer<br>"
     "<b>F</b> - zoom farther<br>"
     "<b>T</b> - clear selection<br>"
+    "<b>I</b> - show/hide timings (when SKY_OF_STARS_TRACE is set)<br>"
     "<h3>Mouse controls:</h3>"
     "<b>Left button + movement</b> - rotate up/down/left/right<br>"
     "<b>Wheel</b> - zoom closer/farther<br>"
@@ -42,20 +62,43 @@ ABOUT_TEXT = (
 
 
 class Form(QtWidgets.QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, catalog_path=None, trace_path=None,
+                 use_opengl=False):
         super().__init__(parent)
 
-        self.stars3d = parser.parse_stars3d("stars/")
+        # timings are only collected when a trace file is asked for
+        self.trace_path = trace_path
+        self.instrumentation = instrumentation.Instrumentation(
+            trace_path is not None)
+        self.hud_visible = trace_path is not None
+
+        with self.instrumentation.measure("load_catalog"):
+            if catalog_path is None:
+                self.stars3d = catalog_cache.load_catalog("stars/")
+            else:
+                self.stars3d = ingestion.load_dbf_catalog(
+                    catalog_path, "stars/")
+        with self.instrumentation.measure("level_of_detail"):
+            self.level_of_detail = level_of_detail.LevelOfDetail(
+                self.stars3d)
+        self.projection = incremental_projection.IncrementalProjection(
+            self.stars3d, self.level_of_detail)
+        # views that are revisited are not projected again
+        self.projection_cache = projection_cache.ProjectionCache(
+            self.project_missed_view_area)
         self.view_area = geometry.ViewArea(geometry.Vector3D(0, 0, 1),
                                            geometry.Vector3D(0, 1, 0),
                                            math.pi / 5)
-        self.stars2d = None
-        self.update_stars2d()
+        self.view_transition = None
+        self.projection_worker = projection_worker.ProjectionWorker(
+            self.project_view_area, parent=self)
+        self.projection_worker.finished.connect(self.update)
+        self.projection_worker.project_now(self.view_area)
+        self.stars2d = self.projection_worker.get_result()
+        self.frame_scheduler = frame_scheduler.FrameScheduler(
+            self.update_stars2d, parent=self)
 
-        self.constellations_list = list(
-            set([star.constellation for star in self.stars3d]))
-        self.constellations_centers, self.constellations_radii = \
-            geometry.calculate_constellations_properties(self.stars3d)
+        self.constellations_list = list(self.stars3d.constellation_names)
 
         self.mouse_press_coordinates = None
         self.selected_constellation = None
@@ -67,6 +110,7 @@ class Form(QtWidgets.QWidget):
         self.search_button.clicked.connect(self.show_search)
         layout.addWidget(self.search_button)
         self.search_text = ""
+        self.search_index = None
 
         self.help_button = QtWidgets.QPushButton("Help", self)
         self.help_button.clicked.connect(self.show_help)
@@ -81,12 +125,50 @@ class Form(QtWidgets.QWidget):
         layout.addWidget(self.exit_button)
 
         self.info_popup = None
+        # the full catalog lines are only read for stars that are shown
+        self.star_details = star_details.StarDetails(self.stars3d, "stars/")
 
         self.setWindowState(QtCore.Qt.WindowMaximized)
         self.setWindowTitle("Sky full of stars")
         self.background = QtGui.QImage("bg.png")
+        self.star_layer = None
+        self.star_layer_key = None
+        self.screen_points = None
+        self.screen_points_key = None
+        self.pick_index = None
+
+        # the stars are projected here and drawn with QPainter, unless
+        # OpenGL is asked for and works, then the vertex shader draws them
+        self.sky_view = None
+        self.stars2d_stale = False
+        self.opengl_failure = None
+        if use_opengl and gl_renderer.is_available():
+            self.sky_view = gl_renderer.SkyGLWidget(
+                self.stars3d, self.paint_with_opengl, self.use_painter, self)
+            self.sky_view.setAttribute(
+                QtCore.Qt.WA_TransparentForMouseEvents)
+            self.sky_view.lower()
+
+    def use_painter(self, message):
+        # the reason is shown on the timings overlay
+        self.opengl_failure = message.strip()
+        self.sky_view.hide()
+        self.sky_view.deleteLater()
+        self.sky_view = None
+        self.frame_scheduler.request()
+
+    def update_view(self):
+        if self.sky_view is None:
+            self.update()
+        else:
+            self.sky_view.update()
 
     def resizeEvent(self, event):
+        if self.sky_view is not None:
+            self.sky_view.setGeometry(self.rect())
+        # cached projections are told apart to a fraction of a pixel
+        self.projection_cache.set_limits(
+            screen_side=min(self.width(), self.height()))
         width = self.width() / 10
         height = self.height() / 20
 
@@ -116,40 +198,58 @@ class Form(QtWidgets.QWidget):
         about_form.show()
 
     def show_search(self):
+        # designations are read from the catalog text on the first search
+        if self.search_index is None:
+            with self.instrumentation.measure("search_index"):
+                self.search_index = search_index.build_search_index(
+                    self.stars3d, "stars/")
+
         position = self.search_button.mapToGlobal(Qt.QPoint(0, 0))
         search_form = search_window.SearchWindow(
             self.search_text,
-            self.constellations_list,
-            self.change_selected_constellation,
+            self.search_index,
+            self.select_search_result,
             position.x(),
             position.y() + self.about_button.height(),
             self)
         search_form.show()
 
-    def show_info_popup(self, x, y, star):
-        point2d = self.convert_point2d_to_screen_coordinates(star.point)
-        text = star.tooltip
+    def show_info_popup(self, x, y, position):
+        point2d = self.convert_point2d_to_screen_coordinates(
+            geometry.Vector2D(*self.stars2d.points[position].tolist()))
+        with self.instrumentation.measure("star_details"):
+            text = self.star_details.get_text(self.stars2d.indices[position])
 
         self.info_popup = popup_window.PopupWindow(
             text,
-            self.x() + point2d.x,
-            self.y() + point2d.y,
+            self.x() + round(point2d.x),
+            self.y() + round(point2d.y),
             True,
             self)
         self.info_popup.show()
 
-    def change_selected_constellation(self, constellation):
-        self.search_text = constellation
-        self.selected_constellation = constellation.title()
-        if constellation.title() in self.constellations_centers:
-            new_view_vector3d = self.constellations_centers[
-                constellation.title()]
-            # new_view_angle = self.constellations_radii[constellation.title()]
+    def select_search_result(self, text, entry):
+        self.search_text = text
+        if entry is None:
+            self.selected_constellation = None
+            self.update_view()
+            return
+
+        self.selected_constellation = entry.constellation
+        if entry.star_index is None:
+            new_view_vector3d, radius = self.stars3d.get_enclosing_cap(
+                self.stars3d.get_constellation_id(entry.constellation))
+            new_view_angle = geometry.get_fitting_view_angle(radius)
+        else:
+            new_view_vector3d = self.stars3d.get_point3d(entry.star_index)
             new_view_angle = self.view_area.view_angle
-            self.view_area = geometry.ViewArea(
-                new_view_vector3d, self.view_area.rotation_vector3d,
-                new_view_angle)
-        self.update_stars2d()
+        self.view_transition = geometry.ViewTransition(
+            self.view_area.copy(),
+            geometry.ViewArea(new_view_vector3d,
+                              self.view_area.rotation_vector3d,
+                              new_view_angle),
+            time.perf_counter(), FLY_TO_DURATION)
+        self.frame_scheduler.request()
 
     def get_radius_and_shifts(self):
         side = min(self.width(), self.height())
@@ -163,10 +263,12 @@ class Form(QtWidgets.QWidget):
             shift_width + side / 2 + point2d.x * side / 2,
             shift_height + side / 2 + point2d.y * side / 2)
 
-    def paintEvent(self, event):
-        painter = QtGui.QPainter(self)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    def convert_points2d_to_screen_coordinates(self, points2d):
+        side, shift_width, shift_height = self.get_radius_and_shifts()
+        return points2d * (side / 2) + (shift_width + side / 2,
+                                        shift_height + side / 2)
 
+    def paint_background(self, painter):
         side, shift_width, shift_height = self.get_radius_and_shifts()
 
         rectangle = QtCore.QRect(0, 0, self.width(), self.height())
@@ -176,40 +278,122 @@ class Form(QtWidgets.QWidget):
         painter.setBrush(QtGui.QColor("black"))
         painter.drawEllipse(shift_width, shift_height, side, side)
 
-        threshold = self.view_area.get_brightness_threshold()
-        if not self.stars2d:
-            max_brightness = 0
-        else:
-            max_brightness = min(
-                [star2d.brightness for star2d in self.stars2d])
+    def render_star_layer(self, screen_points):
+        ratio = self.devicePixelRatioF()
+        layer = QtGui.QImage(round(self.width() * ratio),
+                             round(self.height() * ratio),
+                             QtGui.QImage.Format_ARGB32_Premultiplied)
+        layer.setDevicePixelRatio(ratio)
 
-        for star2d in self.stars2d:
-            visible_brightness = geometry.map_value(
-                star2d.brightness, threshold, max_brightness, 50, 255)
-            color_object = star2d.get_color(visible_brightness)
+        painter = QtGui.QPainter(layer)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        self.paint_background(painter)
+
+        levels = renderer.get_star_levels(
+            self.stars2d, self.view_area.get_brightness_threshold())
+        draw_calls = renderer.draw_stars(
+            painter, screen_points, levels, self.stars2d.color_classes,
+            STAR_RADIUS)
+        self.instrumentation.count("draw_calls", draw_calls)
+
+        painter.end()
+        return layer
+
+    def update_screen_points(self):
+        key = (self.stars2d, self.width(), self.height())
+        if key != self.screen_points_key:
+            self.screen_points = self.convert_points2d_to_screen_coordinates(
+                self.stars2d.points)
+            self.pick_index = None
+            self.screen_points_key = key
 
-            painter.setPen(color_object)
-            painter.setBrush(color_object)
+    def paintEvent(self, event):
+        if self.sky_view is not None:
+            return
+        painter = QtGui.QPainter(self)
+        with self.instrumentation.measure("paint"):
+            self.paint(painter)
+        if self.hud_visible:
+            self.paint_hud(painter)
+        painter.end()
+
+    def paint_with_opengl(self, painter):
+        with self.instrumentation.measure("paint"):
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            self.paint_background(painter)
+            stars_count = self.sky_view.draw_stars(
+                painter, self.view_area, STAR_RADIUS)
+            self.instrumentation.count("stars_sent", stars_count)
+            self.paint_overlay(painter)
+        if self.hud_visible:
+            self.paint_hud(painter)
+
+    def paint_hud(self, painter):
+        self.instrumentation.count(
+            "merged_requests", self.frame_scheduler.get_merged_count())
+
+        font = QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont)
+        font.setPointSize(HUD_FONT_SIZE)
+        painter.setFont(font)
+        painter.setPen(QtGui.QColor("lime"))
+        lines = self.instrumentation.get_report_lines()
+        if self.opengl_failure is not None:
+            lines.append("OpenGL is not used: " +
+                         self.opengl_failure.partition("\n")[0])
+        painter.drawText(self.rect().adjusted(0, 0, -10, -10),
+                         QtCore.Qt.AlignRight | QtCore.Qt.AlignBottom,
+                         "\n".join(lines))
+
+    def paint(self, painter):
+        # take the newest finished projection, clicks are resolved against
+        # the stars that are on the screen
+        self.stars2d = self.projection_worker.get_result()
+        self.update_screen_points()
+
+        # the star field is redrawn only when the projection or the size
+        # changes, selection and labels are drawn over it every time
+        key = (self.stars2d, self.width(), self.height(),
+               self.devicePixelRatioF())
+        if key != self.star_layer_key:
+            self.star_layer = self.render_star_layer(self.screen_points)
+            self.star_layer_key = key
 
-            point2d = self.convert_point2d_to_screen_coordinates(star2d.point)
-            painter.drawEllipse(
-                point2d.x - STAR_RADIUS / 2, point2d.y - STAR_RADIUS / 2,
-                STAR_RADIUS, STAR_RADIUS)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.drawImage(0, 0, self.star_layer)
+        self.paint_overlay(painter)
+
+    def get_selection_points(self, selected_id):
+        indices = self.stars3d.get_constellation_indices(selected_id)
+        if self.sky_view is None:
+            return self.screen_points[self.stars2d.get_positions(indices)]
+
+        # without a projection of the whole view only the selected stars
+        # are projected
+        indices = indices[self.stars3d.brightness[indices] <=
+                          self.view_area.get_brightness_threshold()]
+        _, points2d = self.view_area.project_points3d(
+            self.stars3d.points[indices], math.cos(self.view_area.view_angle),
+            math.sin(self.view_area.view_angle))
+        return self.convert_points2d_to_screen_coordinates(points2d)
+
+    def paint_overlay(self, painter):
+        side, shift_width, shift_height = self.get_radius_and_shifts()
 
-            if star2d.constellation == self.selected_constellation:
-                painter.setPen(QtGui.QColor("red"))
-                painter.setBrush(QtGui.QColor("transparent"))
-                painter.drawRect(point2d.x - STAR_SELECTION_RADIUS / 2,
-                                 point2d.y - STAR_SELECTION_RADIUS / 2,
-                                 STAR_SELECTION_RADIUS, STAR_SELECTION_RADIUS)
+        selected_id = self.stars3d.get_constellation_id(
+            self.selected_constellation)
+        if selected_id is not None:
+            renderer.draw_selection(
+                painter, self.get_selection_points(selected_id),
+                STAR_SELECTION_RADIUS)
 
         if self.selected_constellation in self.constellations_list:
             painter.setPen(QtGui.QColor("white"))
             font = QtGui.QFont()
-            font.setPointSize(side / 20)
+            font.setPointSize(side // 20)
             painter.setFont(font)
-            painter.drawText(shift_width + side / 4, shift_height + side / 8,
-                             side / 2, side / 4,
+            painter.drawText(QtCore.QRectF(shift_width + side / 4,
+                                           shift_height + side / 8,
+                                           side / 2, side / 4),
                              QtCore.Qt.TextWordWrap | QtCore.Qt.AlignHCenter,
                              self.selected_constellation.title())
 
@@ -217,6 +401,7 @@ class Form(QtWidgets.QWidget):
         rotate_step = self.view_area.get_rotate_step()
         zoom_step = self.view_area.get_zoom_step()
         key = event.key()
+        self.view_transition = None
 
         if key == QtCore.Qt.Key_W:
             self.view_area.move(rotate_step, 0, 0, 0)
@@ -236,15 +421,25 @@ class Form(QtWidgets.QWidget):
             self.view_area.move(0, 0, 0, -zoom_step)
         if key == QtCore.Qt.Key_T:
             self.selected_constellation = None
+        if key == QtCore.Qt.Key_I and self.instrumentation.enabled:
+            self.hud_visible = not self.hud_visible
 
-        self.update_stars2d()
+        self.frame_scheduler.request()
 
     def get_nearest_star(self, click_point):
-        for star2d in self.stars2d:
-            point2d = self.convert_point2d_to_screen_coordinates(star2d.point)
-            if point2d.distance_to(
-                    click_point) <= CLICK_TOLERANCE * STAR_RADIUS:
-                return star2d
+        with self.instrumentation.measure("get_nearest_star"):
+            # with OpenGL the view is only projected here for clicks
+            if self.stars2d_stale:
+                self.projection_worker.project_now(self.view_area)
+                self.stars2d = self.projection_worker.get_result()
+                self.stars2d_stale = False
+            self.update_screen_points()
+            # the index lives until the next projection or resize
+            if self.pick_index is None:
+                self.pick_index = pick_index.PickIndex(
+                    self.screen_points, CLICK_TOLERANCE * STAR_RADIUS)
+            return self.pick_index.get_nearest(
+                click_point.x, click_point.y)
 
     def mousePressEvent(self, event):
         side, shift_width, shift_height = self.get_radius_and_shifts()
@@ -260,18 +455,20 @@ class Form(QtWidgets.QWidget):
             self.mouse_press_coordinates = event.pos()
         if button == QtCore.Qt.RightButton:
             nearest_star = self.get_nearest_star(click_point)
-            self.selected_constellation = (None if not nearest_star else
-                                           nearest_star.constellation)
-            self.update()
+            self.selected_constellation = (
+                None if nearest_star is None else
+                self.stars2d.get_constellation(nearest_star))
+            self.update_view()
         if button == QtCore.Qt.MiddleButton:
             nearest_star = self.get_nearest_star(click_point)
-            if nearest_star:
+            if nearest_star is not None:
                 self.show_info_popup(event.x(), event.y(), nearest_star)
 
     def mouseMoveEvent(self, event):
         if self.mouse_press_coordinates is None:
             return
         rotate_step = self.view_area.get_rotate_step()
+        self.view_transition = None
 
         delta_x = event.x() - self.mouse_press_coordinates.x()
         delta_y = event.y() - self.mouse_press_coordinates.y()
@@ -279,27 +476,66 @@ class Form(QtWidgets.QWidget):
                             -delta_x / self.height() * 30 * rotate_step, 0, 0)
         self.mouse_press_coordinates = event.pos()
 
-        self.update_stars2d()
+        self.frame_scheduler.request()
 
     def mouseReleaseEvent(self, event):
         self.mouse_press_coordinates = None
 
     def wheelEvent(self, event):
         zoom_step = self.view_area.get_zoom_step()
+        self.view_transition = None
 
         self.view_area.move(0, 0, 0, -event.angleDelta().y() / 120 * zoom_step)
-        self.update_stars2d()
+        self.frame_scheduler.request()
 
     def update_stars2d(self):
-        self.stars2d = geometry.project_visible_points(
-            self.stars3d, self.view_area)
-        self.update()
+        with self.instrumentation.measure("update_stars2d"):
+            if self.view_transition is not None:
+                now = time.perf_counter()
+                self.view_area = self.view_transition.get_view_area(now)
+                if self.view_transition.is_finished(now):
+                    self.view_transition = None
+                else:
+                    self.frame_scheduler.request()
+            if self.sky_view is None:
+                self.projection_worker.submit(self.view_area)
+            else:
+                self.stars2d_stale = True
+                self.sky_view.update()
+
+    def project_view_area(self, view_area):
+        # runs on the projection thread
+        with self.instrumentation.measure("projection"):
+            stars2d = self.projection_cache.project(
+                view_area, self.stars3d.version)
+        self.instrumentation.count("stars_visible", len(stars2d))
+        self.instrumentation.count(
+            "projection_cache_hits", self.projection_cache.hits_count)
+        self.instrumentation.count(
+            "projection_cache_kb", self.projection_cache.memory_usage // 1024)
+        return stars2d
+
+    def project_missed_view_area(self, view_area):
+        # only views that are not in the cache test any stars
+        stars2d = self.projection.project(view_area)
+        self.instrumentation.count(
+            "stars_tested", len(self.projection.candidates))
+        return stars2d
+
+    def closeEvent(self, event):
+        self.projection_worker.shutdown()
+        if self.trace_path is not None:
+            self.instrumentation.export_trace(self.trace_path)
+        super().closeEvent(event)
 
 
 def main():
     application = QtWidgets.QApplication(sys.argv)
 
-    form = Form()
+    form = Form(catalog_path=sys.argv[1] if len(sys.argv) > 1 else None,
+                trace_path=os.environ.get(TRACE_VARIABLE),
+                use_opengl=os.environ.get(RENDERER_VARIABLE) ==
+                OPENGL_RENDERER)
     form.show()
 
     exit(application.exec())
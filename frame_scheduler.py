@@ -0,0 +1,55 @@
+__author__ = 'borozdin'
+
+from PyQt5 import QtCore
+import time
+
+
+DEFAULT_FPS = 60
+
+
+class FrameScheduler(QtCore.QObject):
+    # requests between two frames are merged into one call of frame_function
+    def __init__(self, frame_function, fps=DEFAULT_FPS, parent=None):
+        super().__init__(parent)
+
+        self.frame_function = frame_function
+        self.frame_interval = 1 / fps
+        self.last_frame_time = None
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_frame)
+
+        self.requests_count = 0
+        self.frames_count = 0
+
+    def set_fps(self, fps):
+        self.frame_interval = 1 / fps
+
+    def get_fps(self):
+        return 1 / self.frame_interval
+
+    def get_merged_count(self):
+        pending_count = 1 if self.timer.isActive() else 0
+        return self.requests_count - self.frames_count - pending_count
+
+    def request(self):
+        self.requests_count += 1
+        if self.timer.isActive():
+            return
+
+        delay = 0
+        if self.last_frame_time is not None:
+            delay = max(0, self.last_frame_time + self.frame_interval -
+                        time.perf_counter())
+        self.timer.start(round(delay * 1000))
+
+    def flush(self):
+        if self.timer.isActive():
+            self.timer.stop()
+            self.run_frame()
+
+    def run_frame(self):
+        self.last_frame_time = time.perf_counter()
+        self.frames_count += 1
+        self.frame_function()
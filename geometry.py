@@ -2,11 +2,13 @@ __author__ = 'borozdin'
 
 import math
 import star
-import collections
+import numpy
 
 
 EPSILON = 1e-9
-BINARY_SEARCH_ITERATIONS = 20
+MIN_VIEW_ANGLE = 0.01
+MAX_VIEW_ANGLE = math.pi / 2 - 0.01
+FIT_MARGIN = 1.15
 
 
 def float_equal(first, second):
@@ -21,6 +23,11 @@ def fit_in_segment(value, left_border, right_border):
     return value
 
 
+def dot_product(points3d, vector3d):
+    return (points3d[:, 0] * vector3d.x + points3d[:, 1] * vector3d.y +
+            points3d[:, 2] * vector3d.z)
+
+
 def map_value(value, from_left, from_right, to_left, to_right):
     from_delta = value - from_left
     to_delta = from_delta * (to_right - to_left) / (from_right - from_left)
@@ -87,6 +94,13 @@ class Vector3D:
                         math.cos(latitude) * math.sin(longitude),
                         math.sin(latitude))
 
+    def convert_to_spherical_coordinates(self):
+        length = self.length()
+        latitude = math.asin(fit_in_segment(self.z / length, -1, 1))
+        longitude = math.atan2(self.y, self.x) % (2 * math.pi)
+
+        return math.degrees(latitude), math.degrees(longitude)
+
     def __add__(self, other):
         return Vector3D(self.x + other.x, self.y + other.y, self.z + other.z)
 
@@ -150,6 +164,137 @@ class Vector3D:
                 float_equal(self.z, other.z))
 
 
+class Quaternion:
+    def __init__(self, w, x, y, z):
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @staticmethod
+    def from_axis_angle(axis, angle):
+        axis = axis.normalize()
+        sin_half = math.sin(angle / 2)
+        return Quaternion(math.cos(angle / 2), axis.x * sin_half,
+                          axis.y * sin_half, axis.z * sin_half)
+
+    @staticmethod
+    def from_frame(view_vector3d, rotation_vector3d):
+        # the rotation taking the z axis to the view vector and the y axis
+        # to the rotation vector made orthogonal to it
+        column3 = view_vector3d.normalize()
+        column2 = rotation_vector3d - column3 * (rotation_vector3d % column3)
+        if float_equal(column2.length(), 0):
+            column2 = Vector3D(1, 0, 0) if abs(column3.x) < 0.5 else \
+                Vector3D(0, 1, 0)
+            column2 = column2 - column3 * (column2 % column3)
+        column2 = column2.normalize()
+        column1 = column2 * column3
+
+        trace = column1.x + column2.y + column3.z
+        if trace > 0:
+            scale = math.sqrt(trace + 1) * 2
+            quaternion = Quaternion(
+                scale / 4, (column2.z - column3.y) / scale,
+                (column3.x - column1.z) / scale,
+                (column1.y - column2.x) / scale)
+        elif column1.x > column2.y and column1.x > column3.z:
+            scale = math.sqrt(1 + column1.x - column2.y - column3.z) * 2
+            quaternion = Quaternion(
+                (column2.z - column3.y) / scale, scale / 4,
+                (column2.x + column1.y) / scale,
+                (column3.x + column1.z) / scale)
+        elif column2.y > column3.z:
+            scale = math.sqrt(1 + column2.y - column1.x - column3.z) * 2
+            quaternion = Quaternion(
+                (column3.x - column1.z) / scale,
+                (column2.x + column1.y) / scale, scale / 4,
+                (column3.y + column2.z) / scale)
+        else:
+            scale = math.sqrt(1 + column3.z - column1.x - column2.y) * 2
+            quaternion = Quaternion(
+                (column1.y - column2.x) / scale,
+                (column3.x + column1.z) / scale,
+                (column3.y + column2.z) / scale, scale / 4)
+        return quaternion.normalize()
+
+    def __mul__(self, other):
+        return Quaternion(
+            self.w * other.w - self.x * other.x - self.y * other.y -
+            self.z * other.z,
+            self.w * other.x + self.x * other.w + self.y * other.z -
+            self.z * other.y,
+            self.w * other.y - self.x * other.z + self.y * other.w +
+            self.z * other.x,
+            self.w * other.z + self.x * other.y - self.y * other.x +
+            self.z * other.w)
+
+    def __neg__(self):
+        return Quaternion(-self.w, -self.x, -self.y, -self.z)
+
+    def __mod__(self, other):
+        return (self.w * other.w + self.x * other.x + self.y * other.y +
+                self.z * other.z)
+
+    def length(self):
+        return math.sqrt(self % self)
+
+    def normalize(self):
+        length = self.length()
+        if float_equal(length, 0):
+            raise Exception()
+        return Quaternion(self.w / length, self.x / length, self.y / length,
+                          self.z / length)
+
+    def rotate(self, vector3d):
+        axis = Vector3D(self.x, self.y, self.z)
+        twice_cross = axis * vector3d * 2
+        return vector3d + twice_cross * self.w + axis * twice_cross
+
+    def get_view_vectors(self):
+        # the images of the z and y axes, which are the view vector and the
+        # rotation vector of a view with this orientation
+        w, x, y, z = self.w, self.x, self.y, self.z
+        return (Vector3D(2 * (x * z + w * y), 2 * (y * z - w * x),
+                         1 - 2 * (x * x + y * y)),
+                Vector3D(2 * (x * y - w * z), 1 - 2 * (x * x + z * z),
+                         2 * (y * z + w * x)))
+
+    def slerp(self, other, fraction):
+        cos_angle = self % other
+        # both quaternions describe the same rotation, take the short way
+        if cos_angle < 0:
+            other = -other
+            cos_angle = -cos_angle
+
+        if cos_angle > 1 - EPSILON:
+            first_weight = 1 - fraction
+            second_weight = fraction
+        else:
+            angle = math.acos(cos_angle)
+            sin_angle = math.sin(angle)
+            first_weight = math.sin((1 - fraction) * angle) / sin_angle
+            second_weight = math.sin(fraction * angle) / sin_angle
+        return Quaternion(
+            self.w * first_weight + other.w * second_weight,
+            self.x * first_weight + other.x * second_weight,
+            self.y * first_weight + other.y * second_weight,
+            self.z * first_weight + other.z * second_weight).normalize()
+
+    def __repr__(self):
+        return "(" + str(self.w) + ", " + str(self.x) + ", " + \
+               str(self.y) + ", " + str(self.z) + ")"
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __eq__(self, other):
+        return (float_equal(self.w, other.w) and
+                float_equal(self.x, other.x) and
+                float_equal(self.y, other.y) and
+                float_equal(self.z, other.z))
+
+
 def get_intersection(line1, line2, surface1, surface2, surface3):
     volume1 = (surface1 - line1) * (surface2 - line1) % (surface3 - line1)
     volume2 = (surface2 - line2) * (surface1 - line2) % (surface3 - line2)
@@ -166,56 +311,155 @@ class ViewArea:
         self.view_vector3d = view_vector3d
         self.rotation_vector3d = rotation_vector3d
         self.view_angle = view_angle
+        self.orientation = None
+        self.orientation_key = None
 
-    def project_point3d(self, point3d, cos_view_angle, sin_view_angle):
+        self.basis_key = None
+        self.basis_vectors = None
+        self.basis_matrix = None
+        self.view_offsets = None
+        self.inverse_gram = None
+
+    def update_basis(self):
         view_vector3d = self.view_vector3d
+        direction_vector1 = self.rotation_vector3d
+        direction_vector2 = view_vector3d * direction_vector1
+        normal = direction_vector1 * direction_vector2
+
+        self.basis_vectors = (
+            view_vector3d, direction_vector1, direction_vector2, normal)
+        self.basis_matrix = numpy.array(
+            [(vector.x, vector.y, vector.z)
+             for vector in self.basis_vectors]).T
+        self.view_offsets = (view_vector3d % direction_vector1,
+                             view_vector3d % direction_vector2,
+                             view_vector3d % normal)
+
+        # the projected point is a combination of both direction vectors,
+        # its squared length is found from the two dot products through
+        # the inverse Gram matrix, so they need not be orthonormal
+        gram11 = direction_vector1 % direction_vector1
+        gram12 = direction_vector1 % direction_vector2
+        gram22 = direction_vector2 % direction_vector2
+        determinant = gram11 * gram22 - gram12 ** 2
+        if float_equal(determinant, 0):
+            # the plane is degenerate, projecting will fail on the normal
+            self.inverse_gram = (0, 0, 0)
+        else:
+            self.inverse_gram = (gram22 / determinant,
+                                 -gram12 / determinant,
+                                 gram11 / determinant)
+
+        self.basis_key = (self.view_vector3d, self.rotation_vector3d)
+
+    def get_basis(self):
+        # vectors are replaced, never changed in place, so the basis is
+        # only rebuilt after the view has moved
+        if (self.basis_key is None or
+                self.basis_key[0] is not self.view_vector3d or
+                self.basis_key[1] is not self.rotation_vector3d):
+            self.update_basis()
+        return self.basis_vectors
+
+    def get_length2(self, x, y):
+        inverse11, inverse12, inverse22 = self.inverse_gram
+        return inverse11 * x * x + 2 * inverse12 * x * y + inverse22 * y * y
+
+    def project_point3d(self, point3d, cos_view_angle, sin_view_angle):
+        view_vector3d, direction_vector1, direction_vector2, normal = \
+            self.get_basis()
 
         if point3d % view_vector3d < cos_view_angle:
             return None
 
-        surface_point3d = view_vector3d * cos_view_angle
-        view_radius = sin_view_angle
-
-        direction_vector1 = self.rotation_vector3d
-        direction_vector2 = view_vector3d * direction_vector1
-
-        projected_point3d = get_intersection(
-            point3d, Vector3D(0, 0, 0), surface_point3d,
-            surface_point3d + direction_vector1,
-            surface_point3d + direction_vector2)
-        if projected_point3d is None:
+        # gnomonic projection onto the plane touching the view cone
+        denominator = point3d % normal
+        if abs(denominator) < EPSILON:
             raise Exception()
+        offset1, offset2, normal_offset = self.view_offsets
+        scale = cos_view_angle * normal_offset / denominator
+        x = scale * (point3d % direction_vector1) - cos_view_angle * offset1
+        y = scale * (point3d % direction_vector2) - cos_view_angle * offset2
 
-        pointing_vector = projected_point3d - surface_point3d
-        distance = pointing_vector.length2()
-        if distance > view_radius ** 2:
+        view_radius = sin_view_angle
+        if self.get_length2(x, y) > view_radius ** 2:
             return None
+        return Vector2D(x, y) / view_radius
 
-        result_point = Vector2D(pointing_vector % direction_vector1,
-                                pointing_vector % direction_vector2)
-        return result_point / view_radius
+    def project_points3d(self, points3d, cos_view_angle, sin_view_angle):
+        self.get_basis()
+        products = points3d @ self.basis_matrix
 
-    def move(self, delta_up, delta_right, delta_rotation, delta_view_angle):
-        self.view_vector3d = self.view_vector3d.rotate(
-            -delta_up, self.rotation_vector3d)
+        candidates = numpy.flatnonzero(products[:, 0] >= cos_view_angle)
+        products = products[candidates]
 
-        # rotate right using composition of rotations
-        self.rotation_vector3d = self.rotation_vector3d.rotate_orthogonal(
-            self.view_vector3d)
-        self.view_vector3d = self.view_vector3d.rotate(
-            delta_right, self.rotation_vector3d)
-        self.rotation_vector3d = -self.rotation_vector3d.rotate_orthogonal(
-            self.view_vector3d)
+        # the same projection as project_point3d, for all points at once
+        denominators = products[:, 3]
+        if numpy.any(numpy.abs(denominators) < EPSILON):
+            raise Exception()
+        offset1, offset2, normal_offset = self.view_offsets
+        scales = cos_view_angle * normal_offset / denominators
+        xs = scales * products[:, 1] - cos_view_angle * offset1
+        ys = scales * products[:, 2] - cos_view_angle * offset2
 
-        self.rotation_vector3d = self.rotation_vector3d.rotate(
-            delta_rotation, self.view_vector3d)
+        view_radius = sin_view_angle
+        inside = self.get_length2(xs, ys) <= view_radius ** 2
+        result_points = numpy.column_stack((xs[inside], ys[inside]))
+        return candidates[inside], result_points / view_radius
+
+    def get_orientation(self):
+        # the quaternion follows the vectors if they were replaced directly
+        if (self.orientation is None or
+                self.orientation_key[0] is not self.view_vector3d or
+                self.orientation_key[1] is not self.rotation_vector3d):
+            self.set_orientation(Quaternion.from_frame(
+                self.view_vector3d, self.rotation_vector3d), False)
+        return self.orientation
+
+    def set_orientation(self, orientation, update_vectors=True):
+        self.orientation = orientation
+        if update_vectors:
+            self.view_vector3d, self.rotation_vector3d = \
+                orientation.get_view_vectors()
+        self.orientation_key = (self.view_vector3d, self.rotation_vector3d)
 
-        # normalize vectors to fight against precision errors
-        self.view_vector3d = self.view_vector3d.normalize()
-        self.rotation_vector3d = self.rotation_vector3d.normalize()
+    def move(self, delta_up, delta_right, delta_rotation, delta_view_angle):
+        # rotate up around the rotation vector, right around the axis
+        # orthogonal to both vectors and clockwise around the view vector,
+        # all of them in the coordinates of the view
+        orientation = self.get_orientation()
+        if delta_up:
+            orientation = orientation * Quaternion(
+                math.cos(delta_up / 2), 0, math.sin(delta_up / 2), 0)
+        if delta_right:
+            orientation = orientation * Quaternion(
+                math.cos(delta_right / 2), -math.sin(delta_right / 2), 0, 0)
+        if delta_rotation:
+            orientation = orientation * Quaternion(
+                math.cos(delta_rotation / 2), 0, 0,
+                -math.sin(delta_rotation / 2))
+
+        # normalize the quaternion to fight against precision errors
+        self.set_orientation(orientation.normalize())
 
         self.view_angle = fit_in_segment(
-            self.view_angle + delta_view_angle, 0.01, math.pi / 2 - 0.01)
+            self.view_angle + delta_view_angle, MIN_VIEW_ANGLE,
+            MAX_VIEW_ANGLE)
+
+    def interpolate(self, other, fraction):
+        view_area = ViewArea(None, None, map_value(
+            fraction, 0, 1, self.view_angle, other.view_angle))
+        view_area.set_orientation(
+            self.get_orientation().slerp(other.get_orientation(), fraction))
+        return view_area
+
+    def copy(self):
+        # vectors are never changed in place, so sharing them is enough
+        view_area = ViewArea(
+            self.view_vector3d, self.rotation_vector3d, self.view_angle)
+        view_area.orientation = self.orientation
+        view_area.orientation_key = self.orientation_key
+        return view_area
 
     def get_brightness_threshold(self):
         return 3 / self.view_angle
@@ -234,53 +478,118 @@ class ViewArea:
         return self.__repr__()
 
 
-def project_visible_points(stars3d, view_area, obligatory_constellation=None):
-    projected_stars2d = []
+class ViewTransition:
+    # moves the view smoothly, the orientation is interpolated along the
+    # shortest rotation and the view angle linearly
+    def __init__(self, start_view_area, end_view_area, start_time, duration):
+        self.start_view_area = start_view_area
+        self.end_view_area = end_view_area
+        self.start_time = start_time
+        self.duration = duration
+
+    def get_fraction(self, time):
+        fraction = fit_in_segment(
+            (time - self.start_time) / self.duration, 0, 1)
+        # ease in and out so the movement neither starts nor stops abruptly
+        return fraction * fraction * (3 - 2 * fraction)
+
+    def get_view_area(self, time):
+        return self.start_view_area.interpolate(
+            self.end_view_area, self.get_fraction(time))
+
+    def is_finished(self, time):
+        return time >= self.start_time + self.duration
+
+
+def project_visible_points(stars3d, view_area, obligatory_constellation=None,
+                           level_of_detail=None):
     brightness_threshold = view_area.get_brightness_threshold()
 
     cos_view_angle = math.cos(view_area.view_angle)
     sin_view_angle = math.sin(view_area.view_angle)
 
-    for star3d in stars3d:
-        if star3d.brightness > brightness_threshold:
+    # only the stars of the obligatory constellation are checked, they are
+    # a contiguous range from the brightest to the faintest
+    obligatory_id = stars3d.get_constellation_id(obligatory_constellation)
+    if obligatory_id is not None:
+        members = stars3d.get_constellation_indices(obligatory_id)
+        members = members[:numpy.searchsorted(
+            stars3d.brightness[members], brightness_threshold, side="right")]
+        visible_members, _ = view_area.project_points3d(
+            stars3d.points[members], cos_view_angle, sin_view_angle)
+        if len(visible_members) < len(members):
+            return None
+
+    index = stars3d.index if level_of_detail is None else level_of_detail
+    bright_indices = index.query(
+        view_area.view_vector3d, view_area.view_angle, brightness_threshold)
+    visible_indices, points2d = view_area.project_points3d(
+        stars3d.points[bright_indices], cos_view_angle, sin_view_angle)
+
+    return star.ProjectedStars(
+        stars3d, bright_indices[visible_indices], points2d)
+
+
+def get_cap(center, point):
+    center = center.normalize()
+    return center, center % point
+
+
+def get_cap_of_two(first, second):
+    center = first + second
+    if float_equal(center.length(), 0):
+        # opposite points, only the whole sphere is known to hold them
+        return first, -1.0
+    return get_cap(center, first)
+
+
+def get_cap_of_three(first, second, third):
+    normal = (second - first) * (third - first)
+    if float_equal(normal.length(), 0):
+        # the points lie on one great circle, the widest pair bounds them
+        caps = [get_cap_of_two(first, second), get_cap_of_two(first, third),
+                get_cap_of_two(second, third)]
+        return min(caps, key=lambda cap: cap[1])
+    if normal % first < 0:
+        normal = -normal
+    return get_cap(normal, first)
+
+
+def is_in_cap(cap, point):
+    center, cos_radius = cap
+    return center % point >= cos_radius - EPSILON
+
+
+def get_smallest_enclosing_cap(points3d):
+    # Welzl's algorithm with caps in place of circles, a cap is kept as its
+    # centre and the cosine of its radius; it is exact for points within a
+    # hemisphere, otherwise None is returned
+    if not len(points3d):
+        return None
+    order = numpy.random.RandomState(0).permutation(len(points3d))
+    points3d = [Vector3D(*point) for point in
+                numpy.asarray(points3d, dtype=numpy.float64)[order].tolist()]
+
+    cap = points3d[0], 1.0
+    for first in range(1, len(points3d)):
+        if is_in_cap(cap, points3d[first]):
             continue
+        cap = points3d[first], 1.0
+        for second in range(0, first):
+            if is_in_cap(cap, points3d[second]):
+                continue
+            cap = get_cap_of_two(points3d[first], points3d[second])
+            for third in range(0, second):
+                if not is_in_cap(cap, points3d[third]):
+                    cap = get_cap_of_three(
+                        points3d[first], points3d[second], points3d[third])
+
+    center, cos_radius = cap
+    if cos_radius <= 0 or not all(
+            is_in_cap(cap, point3d) for point3d in points3d):
+        return None
+    return center, math.acos(min(1, cos_radius))
 
-        point2d = view_area.project_point3d(
-            star3d.point, cos_view_angle, sin_view_angle)
-        if point2d is not None:
-            projected_stars2d.append(star.Star(
-                point2d, star3d.brightness, star3d.color,
-                star3d.constellation, star3d.tooltip))
-        elif obligatory_constellation == star3d.constellation:
-            return None
 
-    return projected_stars2d
-
-
-def calculate_constellations_properties(stars3d):
-    vector_sum = collections.defaultdict(lambda: Vector3D(0, 0, 0))
-    radii = {}
-
-    for star3d in stars3d:
-        vector_sum[star3d.constellation] += star3d.point
-
-    for key in vector_sum:
-        vector_sum[key] = vector_sum[key].normalize()
-        # left_border = 0
-        # right_border = math.pi / 2
-        #
-        # for iteration in range(0, BINARY_SEARCH_ITERATIONS):
-        # middle = (left_border + right_border) / 2
-        # stars2d = project_visible_points(
-        #         stars3d,
-        #         ViewArea(vector_sum[key], Vector3D(0, 1, 0), middle),
-        #         key)
-        #
-        #     if stars2d is None:
-        #         left_border = middle
-        #     else:
-        #         right_border = middle
-        #
-        # radii[key] = right_border
-
-    return vector_sum, radii
+def get_fitting_view_angle(radius):
+    return fit_in_segment(radius * FIT_MARGIN, MIN_VIEW_ANGLE, MAX_VIEW_ANGLE)
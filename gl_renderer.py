@@ -0,0 +1,284 @@
+__author__ = 'borozdin'
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+import math
+import numpy
+import geometry
+import renderer
+import star
+
+
+GL_VERSION = (2, 0)
+GL_FLOAT = 0x1406
+GL_POINTS = 0x0000
+GL_VERTEX_PROGRAM_POINT_SIZE = 0x8642
+# position, magnitude and colour at full brightness of every star
+VERTEX_SIZE = 7
+ATTRIBUTES = (("position", 0, 3), ("magnitude", 3, 1), ("color", 4, 3))
+BRIGHTEST_CHUNK = 64
+
+VERTEX_SHADER = """
+#version 120
+
+attribute vec3 position;
+attribute float magnitude;
+attribute vec3 color;
+
+uniform mat4 basis;
+uniform vec3 view_offsets;
+uniform vec3 inverse_gram;
+uniform float cos_view_angle;
+uniform float sin_view_angle;
+uniform float threshold;
+uniform float max_brightness;
+uniform vec2 scale;
+uniform float point_size;
+
+varying vec3 star_color;
+
+const float EPSILON = %(epsilon)s;
+const float LEVELS = %(levels)d.0;
+const float MIN_VISIBLE = %(min_visible)d.0;
+const float MAX_VISIBLE = %(max_visible)d.0;
+
+void hide() {
+    gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+    gl_PointSize = 0.0;
+    star_color = vec3(0.0);
+}
+
+void main() {
+    // the same projection as ViewArea.project_points3d
+    vec4 products = vec4(position, 0.0) * basis;
+    if (magnitude > threshold || products.x < cos_view_angle ||
+            abs(products.w) < EPSILON) {
+        hide();
+        return;
+    }
+    float ratio = cos_view_angle * view_offsets.z / products.w;
+    float x = ratio * products.y - cos_view_angle * view_offsets.x;
+    float y = ratio * products.z - cos_view_angle * view_offsets.y;
+    if (inverse_gram.x * x * x + 2.0 * inverse_gram.y * x * y +
+            inverse_gram.z * y * y > sin_view_angle * sin_view_angle) {
+        hide();
+        return;
+    }
+    gl_Position = vec4(vec2(x, y) / sin_view_angle * scale, 0.0, 1.0);
+    gl_PointSize = point_size;
+
+    // the same brightness levels as renderer.draw_stars
+    float level = LEVELS - 1.0;
+    if (abs(threshold - max_brightness) > EPSILON) {
+        level = clamp(floor((magnitude - threshold) /
+                            (max_brightness - threshold) *
+                            (LEVELS - 1.0) + 0.5), 0.0, LEVELS - 1.0);
+    }
+    float visible = floor(mix(MIN_VISIBLE, MAX_VISIBLE,
+                              level / (LEVELS - 1.0)) + 0.5);
+    star_color = color * visible / 255.0;
+}
+""" % {"epsilon": repr(float(geometry.EPSILON)),
+       "levels": renderer.BRIGHTNESS_LEVELS,
+       "min_visible": renderer.MIN_VISIBLE_BRIGHTNESS,
+       "max_visible": renderer.MAX_VISIBLE_BRIGHTNESS}
+
+FRAGMENT_SHADER = """
+#version 120
+
+varying vec3 star_color;
+
+void main() {
+    gl_FragColor = vec4(star_color, 1.0);
+}
+"""
+
+
+def get_surface_format():
+    surface_format = QtGui.QSurfaceFormat()
+    surface_format.setVersion(*GL_VERSION)
+    surface_format.setProfile(QtGui.QSurfaceFormat.CompatibilityProfile)
+    return surface_format
+
+
+def is_available():
+    # software rasterizers such as llvmpipe are enough, but there may be
+    # no OpenGL at all, for example without a display; a context cannot
+    # even be tried without a GUI application
+    if not isinstance(QtCore.QCoreApplication.instance(),
+                      QtGui.QGuiApplication):
+        return False
+    context = QtGui.QOpenGLContext()
+    context.setFormat(get_surface_format())
+    if not context.create() or context.isOpenGLES():
+        return False
+    surface = QtGui.QOffscreenSurface()
+    surface.setFormat(context.format())
+    surface.create()
+    if not surface.isValid() or not context.makeCurrent(surface):
+        return False
+    context.doneCurrent()
+    version = (context.format().majorVersion(),
+               context.format().minorVersion())
+    return version >= GL_VERSION
+
+
+def get_vertices(stars3d):
+    colors = numpy.array(star.CLASS_COLORS)[stars3d.color_classes]
+    return numpy.ascontiguousarray(numpy.column_stack((
+        stars3d.points, stars3d.brightness, colors)), dtype=numpy.float32)
+
+
+def build_program(parent=None):
+    # returns the program and whether it is linked; a compatibility context
+    # only draws when generic attribute 0 is enabled, so the position, which
+    # every vertex has, is bound to it
+    program = QtGui.QOpenGLShaderProgram(parent)
+    if (not program.addShaderFromSourceCode(
+            QtGui.QOpenGLShader.Vertex, VERTEX_SHADER) or
+            not program.addShaderFromSourceCode(
+                QtGui.QOpenGLShader.Fragment, FRAGMENT_SHADER)):
+        return program, False
+    program.bindAttributeLocation("position", 0)
+    return program, program.link()
+
+
+def set_uniforms(program, parameters, point_size):
+    program.setUniformValue(
+        "basis", QtGui.QMatrix4x4(*parameters["basis"].ravel().tolist()))
+    program.setUniformValue(
+        "view_offsets", QtGui.QVector3D(*parameters["view_offsets"]))
+    program.setUniformValue(
+        "inverse_gram", QtGui.QVector3D(*parameters["inverse_gram"]))
+    program.setUniformValue(
+        "scale", QtGui.QVector2D(*parameters["scale"]))
+    for name in ("cos_view_angle", "sin_view_angle", "threshold",
+                 "max_brightness"):
+        program.setUniformValue(name, float(parameters[name]))
+    program.setUniformValue("point_size", float(point_size))
+
+
+def enable_attributes(program):
+    # the vertex buffer must be bound
+    stride = VERTEX_SIZE * 4
+    for name, offset, size in ATTRIBUTES:
+        program.enableAttributeArray(name)
+        program.setAttributeBuffer(name, GL_FLOAT, offset * 4, size, stride)
+
+
+def disable_attributes(program):
+    for name, _, _ in ATTRIBUTES:
+        program.disableAttributeArray(name)
+
+
+def get_brightest_visible(stars3d, view_area, threshold):
+    # the sky index gives the bright stars around the view from the
+    # brightest, and the first candidate is almost always in the view
+    cos_view_angle = math.cos(view_area.view_angle)
+    sin_view_angle = math.sin(view_area.view_angle)
+    candidates = stars3d.index.query(
+        view_area.view_vector3d, view_area.view_angle, threshold)
+    for start in range(0, len(candidates), BRIGHTEST_CHUNK):
+        chunk = candidates[start:start + BRIGHTEST_CHUNK]
+        visible_indices, _ = view_area.project_points3d(
+            stars3d.points[chunk], cos_view_angle, sin_view_angle)
+        if len(visible_indices):
+            return float(stars3d.brightness[chunk[visible_indices[0]]])
+    return threshold
+
+
+def get_frame_parameters(stars3d, view_area, width, height):
+    # everything a frame needs from the CPU; only a few bright stars around
+    # the view are projected, whatever the size of the catalog
+    view_area.get_basis()
+    threshold = view_area.get_brightness_threshold()
+    side = min(width, height)
+    basis = numpy.zeros((4, 4))
+    basis[:3] = view_area.basis_matrix
+    return {
+        "basis": basis,
+        "view_offsets": view_area.view_offsets,
+        "inverse_gram": view_area.inverse_gram,
+        "cos_view_angle": math.cos(view_area.view_angle),
+        "sin_view_angle": math.sin(view_area.view_angle),
+        "threshold": threshold,
+        "max_brightness": get_brightest_visible(
+            stars3d, view_area, threshold),
+        "scale": (side / width, -side / height),
+        # stars are sorted by magnitude, so the cut is a prefix
+        "count": int(stars3d.get_bright_count(threshold)),
+    }
+
+
+class SkyGLWidget(QtWidgets.QOpenGLWidget):
+    # the whole catalog is uploaded once, and the vertex shader projects
+    # it for every frame; paint_function paints the frame with a QPainter
+    # and calls draw_stars between the background and the overlay, and
+    # failure_function is called if the shaders cannot be built
+    def __init__(self, stars3d, paint_function, failure_function,
+                 parent=None):
+        super().__init__(parent)
+        self.setFormat(get_surface_format())
+
+        self.stars3d = stars3d
+        self.paint_function = paint_function
+        self.failure_function = failure_function
+
+        self.functions = None
+        self.program = None
+        self.buffer = None
+        self.failed = False
+
+    def initializeGL(self):
+        profile = QtGui.QOpenGLVersionProfile(get_surface_format())
+        self.functions = self.context().versionFunctions(profile)
+        if self.functions is None:
+            self.fail("OpenGL {}.{} functions are missing".format(
+                *GL_VERSION))
+            return
+        self.functions.initializeOpenGLFunctions()
+
+        self.program, linked = build_program(self)
+        if not linked:
+            self.fail(self.program.log())
+            return
+
+        vertices = get_vertices(self.stars3d)
+        self.buffer = QtGui.QOpenGLBuffer(QtGui.QOpenGLBuffer.VertexBuffer)
+        self.buffer.create()
+        self.buffer.bind()
+        self.buffer.allocate(vertices.tobytes(), vertices.nbytes)
+        self.buffer.release()
+
+    def fail(self, message):
+        self.failed = True
+        self.failure_function(message)
+
+    def paintGL(self):
+        if self.failed:
+            return
+        painter = QtGui.QPainter(self)
+        self.paint_function(painter)
+        painter.end()
+
+    def draw_stars(self, painter, view_area, star_radius):
+        # returns the number of stars sent to the shader
+        if self.failed or self.program is None:
+            return 0
+        parameters = get_frame_parameters(
+            self.stars3d, view_area, self.width(), self.height())
+
+        painter.beginNativePainting()
+        functions = self.functions
+        functions.glEnable(GL_VERTEX_PROGRAM_POINT_SIZE)
+        self.program.bind()
+        self.buffer.bind()
+        set_uniforms(self.program, parameters,
+                     star_radius * self.devicePixelRatioF())
+        enable_attributes(self.program)
+        functions.glDrawArrays(GL_POINTS, 0, parameters["count"])
+        disable_attributes(self.program)
+
+        self.buffer.release()
+        self.program.release()
+        painter.endNativePainting()
+        return parameters["count"]
@@ -0,0 +1,58 @@
+__author__ = 'borozdin'
+
+import math
+import star
+
+
+MARGIN_RATIO = 0.25
+
+
+class IncrementalProjection:
+    # stars are queried once for a cap a bit wider than the view; while
+    # the view stays inside that cap only those stars are projected again
+    def __init__(self, stars3d, level_of_detail=None,
+                 margin_ratio=MARGIN_RATIO):
+        self.stars3d = stars3d
+        self.level_of_detail = level_of_detail
+        self.margin_ratio = margin_ratio
+
+        self.anchor_vector3d = None
+        self.view_angle = None
+        self.cos_margin = None
+        self.candidates = None
+        self.points3d = None
+        self.queries_count = 0
+
+    def is_valid(self, view_area):
+        return (self.anchor_vector3d is not None and
+                self.view_angle == view_area.view_angle and
+                self.anchor_vector3d % view_area.view_vector3d >=
+                self.cos_margin)
+
+    def get_index(self, view_angle):
+        if self.level_of_detail is None:
+            return self.stars3d.index
+        return self.level_of_detail.get_index(view_angle)
+
+    def reset(self, view_area):
+        margin = view_area.view_angle * self.margin_ratio
+
+        self.anchor_vector3d = view_area.view_vector3d
+        self.view_angle = view_area.view_angle
+        self.cos_margin = math.cos(margin)
+        # the level of detail is chosen for the view itself, not the cap
+        self.candidates = self.get_index(view_area.view_angle).query(
+            view_area.view_vector3d, view_area.view_angle + margin,
+            view_area.get_brightness_threshold())
+        self.points3d = self.stars3d.points[self.candidates]
+        self.queries_count += 1
+
+    def project(self, view_area):
+        if not self.is_valid(view_area):
+            self.reset(view_area)
+
+        visible_indices, points2d = view_area.project_points3d(
+            self.points3d, math.cos(view_area.view_angle),
+            math.sin(view_area.view_angle))
+        return star.ProjectedStars(
+            self.stars3d, self.candidates[visible_indices], points2d)
@@ -0,0 +1,173 @@
+__author__ = 'borozdin'
+
+import csv
+import math
+import os
+import struct
+import catalog
+import geometry
+import parser
+import star
+
+
+DBF_PREFIX_FORMAT = "<4xIHH20x"
+DBF_FIELD_FORMAT = "<11sc4xBB14x"
+DBF_FIELDS_END = b"\r"
+DBF_DELETED_RECORD = b"*"
+DBF_ENCODING = "cp866"
+
+
+def read_dbf_records(path, encoding=DBF_ENCODING):
+    with open(path, "rb") as file:
+        records_count, header_length, record_length = struct.unpack(
+            DBF_PREFIX_FORMAT, file.read(struct.calcsize(DBF_PREFIX_FORMAT)))
+
+        fields = []
+        # every record starts with a deletion flag
+        offset = 1
+        while True:
+            descriptor = file.read(struct.calcsize(DBF_FIELD_FORMAT))
+            if (descriptor[:1] == DBF_FIELDS_END or
+                    len(descriptor) < struct.calcsize(DBF_FIELD_FORMAT)):
+                break
+            name, field_type, length, decimals = struct.unpack(
+                DBF_FIELD_FORMAT, descriptor)
+            fields.append((name.split(b"\0")[0].decode("ascii"),
+                           offset, offset + length))
+            offset += length
+
+        file.seek(header_length)
+        for record_number in range(0, records_count):
+            record = file.read(record_length)
+            if len(record) < record_length:
+                break
+            if record[:1] == DBF_DELETED_RECORD:
+                continue
+            yield {name: record[start:end].decode(encoding).strip()
+                   for name, start, end in fields}
+
+
+def read_csv_records(path, field_names=None, delimiter=",",
+                     encoding="utf-8"):
+    with open(path, newline="", encoding=encoding) as file:
+        for record in csv.DictReader(
+                file, fieldnames=field_names, delimiter=delimiter):
+            yield {name: value.strip() for name, value in record.items()
+                   if name is not None and value is not None}
+
+
+def read_fixed_width_records(path, fields, encoding="utf-8"):
+    with open(path, encoding=encoding) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            yield {name: line[start:end].strip()
+                   for name, start, end in fields}
+
+
+def parse_sexagesimal(text):
+    text = text.strip()
+    sign = -1 if text.startswith("-") else 1
+
+    value = 0
+    for position, part in enumerate(text.lstrip("+-").split(":")):
+        value += float(part.replace(" ", "")) / 60 ** position
+    return sign * value
+
+
+def sexagesimal_field(name):
+    return lambda record: parse_sexagesimal(record[name])
+
+
+def number_field(name, coefficient=1):
+    return lambda record: float(record[name]) * coefficient
+
+
+def optional_number_field(name):
+    # an empty or missing value is unknown rather than an error
+    return lambda record: (float(record[name]) if record.get(name) else
+                           math.nan)
+
+
+def spectral_field(name):
+    return lambda record: parser.parse_color(record[name])
+
+
+def constellation_field(name, constellation_names):
+    return lambda record: constellation_names.get(
+        record[name].upper(), record[name])
+
+
+def constant_field(value):
+    return lambda record: value
+
+
+class ColumnMapping:
+    # every field converts a record into right ascension in hours,
+    # declination in degrees, magnitude, spectral class letter,
+    # constellation name or B-V colour index
+    def __init__(self, right_ascension, declination, brightness,
+                 color=constant_field(star.UNKNOWN_SPECTRAL_LETTER),
+                 constellation=constant_field(""),
+                 color_index=constant_field(math.nan)):
+        self.right_ascension = right_ascension
+        self.declination = declination
+        self.brightness = brightness
+        self.color = color
+        self.constellation = constellation
+        self.color_index = color_index
+
+    def add_record(self, builder, record):
+        right_ascension = self.right_ascension(record)
+        declination = self.declination(record)
+        brightness = self.brightness(record)
+        color = self.color(record)
+        constellation = self.constellation(record)
+        color_index = self.color_index(record)
+
+        point3d = geometry.Vector3D.convert_from_spherical_coordinates(
+            declination, right_ascension * 15)
+        coordinates = (round(right_ascension * 36000) % (24 * 36000),
+                       round(declination * 3600))
+        builder.add(point3d, brightness, color, constellation, coordinates,
+                    color_index)
+
+
+def get_constellation_names(root_path):
+    constellation_names = {}
+    for file in os.listdir(root_path):
+        if file.endswith(".htm") and len(file) == len("and.htm"):
+            try:
+                constellation_names[file[:3].upper()] = \
+                    parser.get_constellation_name(root_path, file)
+            except (AttributeError, UnicodeDecodeError):
+                continue
+    return constellation_names
+
+
+def get_bright_dbf_mapping(root_path):
+    return ColumnMapping(
+        sexagesimal_field("ALF"), sexagesimal_field("DEL"),
+        number_field("M"), spectral_field("SP"),
+        constellation_field("CO", get_constellation_names(root_path)))
+
+
+def ingest_records(records, mapping):
+    builder = catalog.CatalogBuilder()
+    skipped_count = 0
+
+    for record in records:
+        try:
+            mapping.add_record(builder, record)
+        except (ValueError, KeyError, IndexError):
+            # records without usable coordinates, magnitude or class are
+            # skipped, like lines the text parser does not match
+            skipped_count += 1
+
+    return builder.build(), skipped_count
+
+
+def load_dbf_catalog(path, root_path):
+    stars3d, _ = ingest_records(
+        read_dbf_records(path), get_bright_dbf_mapping(root_path))
+    return stars3d
@@ -0,0 +1,97 @@
+__author__ = 'borozdin'
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+import numpy
+
+
+WINDOW_SIZE = 120
+MAX_TRACE_EVENTS = 100000
+PERCENTILES = (50, 95, 99)
+
+
+class Instrumentation:
+    # keeps the latest timings of every named section for the overlay and
+    # all of them, up to a limit, for a trace in the Chrome trace format;
+    # when disabled every call returns at once
+    def __init__(self, enabled=False, window_size=WINDOW_SIZE,
+                 max_trace_events=MAX_TRACE_EVENTS):
+        self.enabled = enabled
+        self.window_size = window_size
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+
+        self.timings = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        self.trace_events = collections.deque(maxlen=max_trace_events)
+
+    def get_timestamp(self, moment):
+        return (moment - self.start_time) * 1e6
+
+    def add_timing(self, name, start, duration):
+        if not self.enabled:
+            return
+        with self.lock:
+            if name not in self.timings:
+                self.timings[name] = collections.deque(
+                    maxlen=self.window_size)
+            self.timings[name].append(duration)
+            self.trace_events.append({
+                "name": name, "ph": "X", "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "ts": self.get_timestamp(start), "dur": duration * 1e6})
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, start, time.perf_counter() - start)
+
+    def count(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = value
+            self.trace_events.append({
+                "name": name, "ph": "C", "pid": os.getpid(),
+                "ts": self.get_timestamp(time.perf_counter()),
+                "args": {name: value}})
+
+    def get_percentiles(self, name, percentiles=PERCENTILES):
+        with self.lock:
+            durations = list(self.timings.get(name, ()))
+        if not durations:
+            return None
+        return numpy.percentile(numpy.array(durations) * 1000, percentiles)
+
+    def get_report_lines(self):
+        with self.lock:
+            names = list(self.timings)
+            counters = list(self.counters.items())
+
+        lines = []
+        for name in names:
+            percentiles = self.get_percentiles(name)
+            lines.append(name + ": " + " ".join(
+                "p{} {:.2f}".format(percentile, value)
+                for percentile, value in zip(PERCENTILES, percentiles)) +
+                " ms")
+        for name, value in counters:
+            lines.append(name + ": " + str(value))
+        return lines
+
+    def export_trace(self, path):
+        with self.lock:
+            events = list(self.trace_events)
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"},
+                      file)
@@ -0,0 +1,69 @@
+__author__ = 'borozdin'
+
+import math
+import numpy
+import sky_index
+
+
+STARS_PER_TILE = 4
+MAX_DRAWN_STARS = 4000
+
+
+class Level:
+    def __init__(self, bands_count, indices, index):
+        self.bands_count = bands_count
+        self.indices = indices
+        self.index = index
+
+    def estimate_drawn_count(self, area, stars_per_tile):
+        tile_area = (math.pi / self.bands_count) ** 2
+        return area / tile_area * stars_per_tile
+
+    def query(self, view_vector3d, view_angle, brightness_threshold=None):
+        return self.indices[self.index.query(
+            view_vector3d, view_angle, brightness_threshold)]
+
+
+class LevelOfDetail:
+    # every level splits the sky into tiles twice as large as the finer
+    # level does and keeps only the brightest stars of every tile, so a
+    # zoomed out view draws a bounded number of stars
+    def __init__(self, stars3d, max_drawn_stars=MAX_DRAWN_STARS,
+                 stars_per_tile=STARS_PER_TILE):
+        self.stars3d = stars3d
+        self.max_drawn_stars = max_drawn_stars
+        self.stars_per_tile = stars_per_tile
+        self.levels = []
+
+        # tiles of the finest level still hold several times more stars
+        # than they keep
+        bands_count = 2 ** math.floor(math.log2(max(1, math.sqrt(
+            len(stars3d) / stars_per_tile / 4))))
+        indices = numpy.arange(len(stars3d))
+        while bands_count >= 1 and len(indices):
+            tiles = sky_index.SkyIndex(
+                stars3d.points[indices], stars3d.brightness[indices],
+                bands_count)
+            indices = indices[tiles.get_brightest_in_cells(stars_per_tile)]
+            self.levels.append(Level(bands_count, indices, sky_index.SkyIndex(
+                stars3d.points[indices], stars3d.brightness[indices])))
+            bands_count //= 2
+
+    def get_level(self, view_angle):
+        area = 2 * math.pi * (1 - math.cos(view_angle))
+        if len(self.stars3d) * area / (4 * math.pi) <= self.max_drawn_stars:
+            return None
+
+        for level in self.levels:
+            if level.estimate_drawn_count(
+                    area, self.stars_per_tile) <= self.max_drawn_stars:
+                return level
+        return self.levels[-1] if self.levels else None
+
+    def get_index(self, view_angle):
+        level = self.get_level(view_angle)
+        return self.stars3d.index if level is None else level
+
+    def query(self, view_vector3d, view_angle, brightness_threshold=None):
+        return self.get_index(view_angle).query(
+            view_vector3d, view_angle, brightness_threshold)
@@ -1,8 +1,10 @@
 __author__ = 'borozdin'
 
 
+import concurrent.futures
 import os
 import re
+import catalog
 import geometry
 import star
 
@@ -11,6 +13,18 @@ NUMBER_RE = r"[\sA-Z]*([-+\d\.]+)"
 HMS_RE = NUMBER_RE + ":" + NUMBER_RE + ":" + NUMBER_RE
 COORDINATES_RE = "^" + NUMBER_RE + HMS_RE * 2 + NUMBER_RE * 3 + r"\s*([:\w]+)"
 
+# the rest of a line is in fixed columns, designations are right-aligned
+# at its end
+GALACTIC_COLUMNS = (slice(25, 31), slice(32, 38))
+TYPE_MAGNITUDE_COLUMNS = slice(38, 47)
+SPECTRUM_COLUMNS = slice(47, 67)
+PROPER_MOTION_COLUMNS = (slice(67, 74), slice(74, 81))
+RADIAL_VELOCITY_COLUMNS = slice(87, 92)
+HD_COLUMNS = slice(92, 99)
+FLAMSTEED_COLUMNS = slice(99, 103)
+BAYER_COLUMNS = slice(103, 107)
+NOTE_COLUMNS = slice(107, None)
+
 
 def parse_angle(hours, minutes, seconds, coefficient):
     return (float(hours.replace(" ", "")) * coefficient +
@@ -22,11 +36,15 @@ def parse_color(color):
     for char in color:
         if char.isupper():
             return char
-    raise Exception()
+    raise ValueError("no spectral class in " + repr(color))
+
+
+def get_constellation_page(file):
+    return file[:file.index(".")] + ".htm"
 
 
 def get_constellation_name(path, file):
-    with open(path + file[:file.index(".")] + ".htm") as text:
+    with open(path + get_constellation_page(file)) as text:
         occurrence = re.search(r"Catalog: (\w+)", text.read())
         return occurrence.group(1)
 
@@ -35,29 +53,118 @@ def format_coordinates(h1, m1, s1, h2, m2, s2):
     return "Alf: {}:{}:{}\nDel: {}:{}:{}".format(h1, m1, s1, h2, m2, s2)
 
 
+def get_catalog_files(root_path):
+    return sorted(os.listdir(root_path + "txt/"))
+
+
+def parse_file_occurrences(root_path, file):
+    constellation_name = get_constellation_name(root_path, file)
+    with open(root_path + "txt/" + file) as text:
+        for occurrence in re.findall(
+                COORDINATES_RE, text.read(), re.MULTILINE):
+            yield constellation_name, occurrence
+
+
+def get_constellation_abbreviation(file, constellation_name):
+    stem = file[:file.index(".")]
+    return stem.title() if stem.isalpha() else constellation_name[:3]
+
+
+def parse_file_designations(root_path, file):
+    constellation_name = get_constellation_name(root_path, file)
+    abbreviation = get_constellation_abbreviation(file, constellation_name)
+    with open(root_path + "txt/" + file) as text:
+        content = text.read()
+
+    # the same lines parse_file_occurrences finds, with their designations
+    for match in re.finditer(COORDINATES_RE, content, re.MULTILINE):
+        line_end = content.find("\n", match.start())
+        line = content[match.start():None if line_end < 0 else line_end]
+        yield (constellation_name, abbreviation, match.groups(),
+               line[HD_COLUMNS].strip(), line[FLAMSTEED_COLUMNS].strip(),
+               line[BAYER_COLUMNS].replace(" ", ""))
+
+
+def parse_occurrences(root_path):
+    for file in get_catalog_files(root_path):
+        yield from parse_file_occurrences(root_path, file)
+
+
+def parse_point3d(occurrence):
+    longitude = parse_angle(occurrence[1], occurrence[2], occurrence[3], 15)
+    latitude = parse_angle(occurrence[4], occurrence[5], occurrence[6], 1)
+
+    return geometry.Vector3D.convert_from_spherical_coordinates(
+        latitude, longitude)
+
+
+def parse_brightness(occurrence):
+    return float(occurrence[9].replace(" ", ""))
+
+
+def parse_catalog_coordinates(occurrence):
+    # tenths of seconds of right ascension and seconds of declination,
+    # exactly as they are written in the catalog
+    right_ascension = round(parse_angle(
+        occurrence[1], occurrence[2], occurrence[3], 36000))
+    sign = -1 if "-" in occurrence[4] else 1
+    declination = sign * round(parse_angle(
+        occurrence[4].replace("-", ""), occurrence[5], occurrence[6], 3600))
+    return right_ascension, declination
+
+
 def parse_stars3d(root_path):
+    # the original star by star loader, kept only as the reference the
+    # tests compare parse_catalog and the catalog cache with
     stars = []
-    path = root_path + "txt/"
-
-    for file in os.listdir(path):
-        constellation_name = get_constellation_name(root_path, file)
-        with open(path + file) as text:
-            for occurrence in re.findall(
-                    COORDINATES_RE, text.read(), re.MULTILINE):
-                longitude = parse_angle(
-                    occurrence[1], occurrence[2], occurrence[3], 15)
-                latitude = parse_angle(
-                    occurrence[4], occurrence[5], occurrence[6], 1)
-
-                point3d = geometry.Vector3D.convert_from_spherical_coordinates(
-                    latitude, longitude)
-                brightness = float(occurrence[9].replace(" ", ""))
-                color = parse_color(occurrence[10])
-                tooltip = format_coordinates(
-                    occurrence[1], occurrence[2], occurrence[3],
-                    occurrence[4], occurrence[5], occurrence[6])
-
-                stars.append(star.Star(
-                    point3d, brightness, color, constellation_name, tooltip))
+
+    for constellation_name, occurrence in parse_occurrences(root_path):
+        point3d = parse_point3d(occurrence)
+        brightness = parse_brightness(occurrence)
+        color = parse_color(occurrence[10])
+        tooltip = format_coordinates(
+            occurrence[1], occurrence[2], occurrence[3],
+            occurrence[4], occurrence[5], occurrence[6])
+
+        stars.append(star.Star(
+            point3d, brightness, color, constellation_name, tooltip))
 
     return stars
+
+
+def get_source_files(root_path):
+    files = set()
+    for file in os.listdir(root_path + "txt/"):
+        files.add("txt/" + file)
+        files.add(get_constellation_page(file))
+    return sorted(files)
+
+
+def parse_file(root_path, file):
+    builder = catalog.CatalogBuilder()
+
+    for constellation_name, occurrence in parse_file_occurrences(
+            root_path, file):
+        builder.add(parse_point3d(occurrence), parse_brightness(occurrence),
+                    parse_color(occurrence[10]), constellation_name,
+                    parse_catalog_coordinates(occurrence))
+
+    return builder
+
+
+def parse_catalog(root_path, processes=None):
+    files = get_catalog_files(root_path)
+    builder = catalog.CatalogBuilder()
+
+    # files are parsed independently, and their stars are merged in the
+    # same order whether they were parsed here or in a process pool
+    if processes is None or processes <= 1:
+        for file in files:
+            builder.extend(parse_file(root_path, file))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            for file_builder in executor.map(
+                    parse_file, [root_path] * len(files), files):
+                builder.extend(file_builder)
+
+    return builder.build()
@@ -0,0 +1,49 @@
+__author__ = 'borozdin'
+
+import math
+import numpy
+
+
+KEY_STRIDE = 2 ** 32
+KEY_SHIFT = 2 ** 31
+
+
+class PickIndex:
+    # points are put into square cells as large as the pick radius, so any
+    # point within the radius lies in one of the nine cells around a click
+    def __init__(self, points, radius):
+        self.points = points
+        self.radius = radius
+
+        cells = numpy.floor(points / radius).astype(numpy.int64)
+        keys = self.get_key(cells[:, 0], cells[:, 1])
+        self.order = numpy.argsort(keys, kind="stable")
+        self.keys, self.starts = numpy.unique(
+            keys[self.order], return_index=True)
+        self.ends = numpy.append(self.starts[1:], len(keys))
+
+    @staticmethod
+    def get_key(cell_x, cell_y):
+        return cell_x * KEY_STRIDE + (cell_y + KEY_SHIFT)
+
+    def get_nearest(self, x, y):
+        cell_x = math.floor(x / self.radius)
+        cell_y = math.floor(y / self.radius)
+
+        candidates = []
+        for delta_x in (-1, 0, 1):
+            for delta_y in (-1, 0, 1):
+                key = self.get_key(cell_x + delta_x, cell_y + delta_y)
+                position = numpy.searchsorted(self.keys, key)
+                if position < len(self.keys) and self.keys[position] == key:
+                    candidates.append(self.order[
+                        self.starts[position]:self.ends[position]])
+        if not candidates:
+            return None
+
+        candidates = numpy.sort(numpy.concatenate(candidates))
+        distances = ((self.points[candidates] - (x, y)) ** 2).sum(axis=1)
+        nearest = numpy.argmin(distances)
+        if distances[nearest] > self.radius ** 2:
+            return None
+        return int(candidates[nearest])
@@ -0,0 +1,93 @@
+__author__ = 'borozdin'
+
+import collections
+import math
+import threading
+
+
+MAX_ENTRIES = 64
+MAX_BYTES = 64 * 1024 * 1024
+# the side of the sky circle in pixels until the window gives its own
+SCREEN_SIDE = 1000
+PIXEL_FRACTION = 0.25
+
+
+def get_view_key(view_area, screen_side=SCREEN_SIDE):
+    # views that differ by less than a quarter of a pixel share the key; a
+    # pixel spans about 2 * view_angle / screen_side, so the zoom is rounded
+    # on a log scale first and gives the same quantum for close views
+    step = 2 * PIXEL_FRACTION / screen_side
+    zoom = round(math.log(view_area.view_angle) / step)
+    quantum = math.exp(zoom * step) * step
+    view_vector3d = view_area.view_vector3d
+    rotation_vector3d = view_area.rotation_vector3d
+    return (zoom,) + tuple(round(value / quantum) for value in (
+        view_vector3d.x, view_vector3d.y, view_vector3d.z,
+        rotation_vector3d.x, rotation_vector3d.y, rotation_vector3d.z))
+
+
+class ProjectionCache:
+    # the latest projections, up to a number of them and a memory limit;
+    # the least recently used go first
+    def __init__(self, projection_function, max_entries=MAX_ENTRIES,
+                 max_bytes=MAX_BYTES, screen_side=SCREEN_SIDE):
+        self.projection_function = projection_function
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.screen_side = screen_side
+        self.lock = threading.Lock()
+
+        self.entries = collections.OrderedDict()
+        self.memory_usage = 0
+        self.hits_count = 0
+        self.misses_count = 0
+        self.evictions_count = 0
+
+    def get_key(self, view_area, version):
+        # the same key means different views for different screen sides
+        return (version, self.screen_side) + get_view_key(
+            view_area, self.screen_side)
+
+    def set_limits(self, max_entries=None, max_bytes=None,
+                   screen_side=None):
+        # entries of another screen side are no longer found and go first
+        with self.lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if screen_side is not None:
+                self.screen_side = max(1, screen_side)
+            self.evict()
+
+    def evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or
+                                self.memory_usage > self.max_bytes):
+            _, stars2d = self.entries.popitem(last=False)
+            self.memory_usage -= stars2d.get_memory_usage()
+            self.evictions_count += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.memory_usage = 0
+
+    def project(self, view_area, version=0):
+        key = self.get_key(view_area, version)
+        with self.lock:
+            if key in self.entries:
+                self.hits_count += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses_count += 1
+
+        stars2d = self.projection_function(view_area)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = stars2d
+                self.memory_usage += stars2d.get_memory_usage()
+                self.evict()
+        return stars2d
+
+    def __len__(self):
+        return len(self.entries)
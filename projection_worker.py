@@ -0,0 +1,78 @@
+__author__ = 'borozdin'
+
+from PyQt5 import QtCore
+import concurrent.futures
+import threading
+
+
+class ProjectionWorker(QtCore.QObject):
+    # views are projected on one background thread, the newest finished
+    # result is published into a double buffer that the window reads
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, projection_function, parent=None):
+        super().__init__(parent)
+
+        self.projection_function = projection_function
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.future = None
+
+        self.buffers = [None, None]
+        self.front = 0
+        self.jobs_count = 0
+        self.cancelled_count = 0
+
+    def get_result(self):
+        # the front buffer is switched by a single assignment, so reading
+        # it needs no lock
+        return self.buffers[self.front]
+
+    def publish(self, result):
+        back = 1 - self.front
+        self.buffers[back] = result
+        self.front = back
+
+    def is_stale(self, generation):
+        return generation != self.generation
+
+    def run_job(self, view_area, generation):
+        with self.lock:
+            if self.is_stale(generation):
+                self.cancelled_count += 1
+                return
+        result = self.projection_function(view_area)
+        with self.lock:
+            if self.is_stale(generation):
+                self.cancelled_count += 1
+                return
+            self.publish(result)
+        self.finished.emit()
+
+    def submit(self, view_area):
+        # the view is snapshotted, later moves do not affect the job
+        view_area = view_area.copy()
+        with self.lock:
+            self.generation += 1
+            self.jobs_count += 1
+            if self.future is not None and self.future.cancel():
+                self.cancelled_count += 1
+            self.future = self.executor.submit(
+                self.run_job, view_area, self.generation)
+
+    def project_now(self, view_area):
+        with self.lock:
+            self.generation += 1
+        self.wait()
+        self.publish(self.projection_function(view_area.copy()))
+
+    def wait(self):
+        future = self.future
+        if future is not None:
+            concurrent.futures.wait([future])
+
+    def shutdown(self):
+        with self.lock:
+            self.generation += 1
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,86 @@
+__author__ = 'borozdin'
+
+from PyQt5 import QtCore, QtGui
+import numpy
+import geometry
+import star
+
+
+MIN_VISIBLE_BRIGHTNESS = 50
+MAX_VISIBLE_BRIGHTNESS = 255
+BRIGHTNESS_LEVELS = 32
+
+
+def make_polygon(points):
+    # fill the polygon memory directly instead of creating a QPointF for
+    # every star
+    points = numpy.ascontiguousarray(points, dtype=numpy.float64)
+    polygon = QtGui.QPolygonF(len(points))
+    if len(points):
+        pointer = polygon.data()
+        pointer.setsize(points.nbytes)
+        numpy.frombuffer(pointer, dtype=numpy.float64)[:] = points.ravel()
+    return polygon
+
+
+def get_brightness_levels(brightness, threshold, max_brightness):
+    if geometry.float_equal(threshold, max_brightness):
+        return numpy.full(len(brightness), BRIGHTNESS_LEVELS - 1)
+
+    levels = geometry.map_value(
+        brightness, threshold, max_brightness, 0, BRIGHTNESS_LEVELS - 1)
+    return numpy.clip(numpy.round(levels), 0, BRIGHTNESS_LEVELS - 1).astype(
+        int)
+
+
+def get_visible_brightness(level):
+    return round(geometry.map_value(
+        level, 0, BRIGHTNESS_LEVELS - 1,
+        MIN_VISIBLE_BRIGHTNESS, MAX_VISIBLE_BRIGHTNESS))
+
+
+def get_star_levels(stars2d, threshold):
+    # levels are found for the 256 magnitude steps and gathered by star
+    if not len(stars2d):
+        return numpy.zeros(0, dtype=int)
+    level_table = get_brightness_levels(
+        stars2d.stars3d.intensity_magnitudes, threshold,
+        stars2d.max_brightness)
+    return level_table[stars2d.intensities]
+
+
+def draw_stars(painter, screen_points, levels, color_classes, star_radius):
+    if not len(screen_points):
+        return 0
+
+    keys = color_classes.astype(int) * BRIGHTNESS_LEVELS + levels
+    order = numpy.argsort(keys, kind="stable")
+    keys = keys[order]
+    screen_points = screen_points[order]
+    bounds = numpy.concatenate(
+        ([0], numpy.flatnonzero(numpy.diff(keys)) + 1, [len(keys)]))
+
+    painter.setBrush(QtCore.Qt.NoBrush)
+    draw_calls = 0
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        color_class, level = divmod(int(keys[start]), BRIGHTNESS_LEVELS)
+        pen = QtGui.QPen(QtGui.QColor.fromRgba(int(star.COLOR_TABLE[
+            color_class, get_visible_brightness(level)])), star_radius)
+        pen.setCapStyle(QtCore.Qt.RoundCap)
+        painter.setPen(pen)
+        painter.drawPoints(make_polygon(screen_points[start:end]))
+        draw_calls += 1
+
+    return draw_calls
+
+
+def draw_selection(painter, screen_points, selection_size):
+    if not len(screen_points):
+        return
+
+    painter.setPen(QtGui.QColor("red"))
+    painter.setBrush(QtGui.QColor("transparent"))
+    painter.drawRects([
+        QtCore.QRectF(x - selection_size / 2, y - selection_size / 2,
+                      selection_size, selection_size)
+        for x, y in screen_points.tolist()])
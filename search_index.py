@@ -0,0 +1,233 @@
+__author__ = 'borozdin'
+
+import bisect
+import collections
+import parser
+
+
+MAX_RESULTS = 20
+FUZZY_CANDIDATES = 30
+# sorts after every character of the keys
+PREFIX_END = "\uffff"
+GREEK_LETTERS = {
+    "Alp": "Alpha", "Bet": "Beta", "Gam": "Gamma", "Del": "Delta",
+    "Eps": "Epsilon", "Zet": "Zeta", "Eta": "Eta", "The": "Theta",
+    "Iot": "Iota", "Kap": "Kappa", "Lam": "Lambda", "Mu": "Mu", "Nu": "Nu",
+    "Xi": "Xi", "Omi": "Omicron", "Pi": "Pi", "Rho": "Rho", "Sig": "Sigma",
+    "Tau": "Tau", "Ups": "Upsilon", "Phi": "Phi", "Chi": "Chi",
+    "Psi": "Psi", "Ome": "Omega",
+}
+
+EXACT_RANK = 0
+PREFIX_RANK = 1
+WORD_PREFIX_RANK = 2
+SUBSTRING_RANK = 3
+FUZZY_RANK = 4
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def get_bigrams(text):
+    return {text[position:position + 2]
+            for position in range(0, len(text) - 1)}
+
+
+def get_word_starts(text):
+    return [0] + [position + 1 for position, char in enumerate(text)
+                  if char == " "]
+
+
+def get_prefix_distance(query, text):
+    # the smallest edit distance between the query and a beginning of the
+    # text that is at most one character shorter or longer
+    text = text[:len(query) + 1]
+    previous = list(range(0, len(text) + 1))
+    for query_position, query_char in enumerate(query, 1):
+        current = [query_position]
+        for text_position, text_char in enumerate(text, 1):
+            current.append(min(
+                previous[text_position] + 1,
+                current[text_position - 1] + 1,
+                previous[text_position - 1] + (query_char != text_char)))
+        previous = current
+    return min(previous[min(len(text), max(0, len(query) - 1)):])
+
+
+def get_bayer_names(bayer):
+    letters = bayer.rstrip("0123456789")
+    if letters not in GREEK_LETTERS:
+        return [bayer]
+    return [bayer, GREEK_LETTERS[letters] + bayer[len(letters):]]
+
+
+class Entry:
+    # a constellation, or a star of it when star_index is set
+    def __init__(self, text, constellation, star_index=None, order=0):
+        self.text = text
+        self.constellation = constellation
+        self.star_index = star_index
+        self.order = order
+
+    def __eq__(self, other):
+        return (isinstance(other, Entry) and
+                self.constellation == other.constellation and
+                self.star_index == other.star_index)
+
+    def __hash__(self):
+        return hash((self.constellation, self.star_index))
+
+    def __repr__(self):
+        return self.text
+
+
+class SearchIndex:
+    # every entry has one or more keys; sorted keys answer prefix queries
+    # by bisection and an index of character pairs picks the candidates
+    # for fuzzy matching
+    def __init__(self, entries_with_keys):
+        self.entries = []
+        self.keys = []
+        key_entries = []
+        for entry, keys in entries_with_keys:
+            entry_id = len(self.entries)
+            self.entries.append(entry)
+            for key in keys:
+                key_entries.append((normalize(key), entry_id))
+
+        key_entries = sorted(set(key_entries))
+        self.keys = [key for key, entry_id in key_entries]
+        self.key_entries = [entry_id for key, entry_id in key_entries]
+
+        self.bigrams = collections.defaultdict(list)
+        self.bigram_counts = []
+        for key_id, key in enumerate(self.keys):
+            bigrams = get_bigrams(" " + key + " ")
+            for bigram in bigrams:
+                self.bigrams[bigram].append(key_id)
+            self.bigram_counts.append(len(bigrams))
+
+    def get_prefix_range(self, query):
+        start = bisect.bisect_left(self.keys, query)
+        end = bisect.bisect_left(self.keys, query + PREFIX_END)
+        return range(start, end)
+
+    def get_substring_candidates(self, query):
+        # a key containing the query contains all of its character pairs
+        postings = sorted((self.bigrams.get(bigram, ())
+                           for bigram in get_bigrams(query)), key=len)
+        if not postings:
+            return range(0, len(self.keys))
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        return sorted(candidates)
+
+    def get_fuzzy_ranks(self, query):
+        query_bigrams = get_bigrams(" " + query + " ")
+        overlaps = collections.Counter()
+        for bigram in query_bigrams:
+            overlaps.update(self.bigrams.get(bigram, ()))
+
+        # short keys sharing most pairs with the query are the most similar
+        similarities = {
+            key_id: overlap / (self.bigram_counts[key_id] +
+                               len(query_bigrams) - overlap)
+            for key_id, overlap in overlaps.items()}
+        candidates = sorted(similarities, key=similarities.get,
+                            reverse=True)[:FUZZY_CANDIDATES]
+
+        ranks = {}
+        max_distance = max(1, len(query) // 4)
+        for key_id in candidates:
+            key = self.keys[key_id]
+            # the query is compared with the beginning of every word, so
+            # an unfinished or misspelled word still matches
+            distance = min(get_prefix_distance(query, key[start:])
+                           for start in get_word_starts(key))
+            if distance <= max_distance:
+                ranks[key_id] = FUZZY_RANK + distance
+        return ranks
+
+    def search(self, text, max_results=MAX_RESULTS):
+        query = normalize(text)
+        if not query:
+            return []
+
+        ranks = {}
+        for key_id in self.get_prefix_range(query):
+            ranks[key_id] = (EXACT_RANK if self.keys[key_id] == query else
+                             PREFIX_RANK)
+        if len(ranks) < max_results:
+            for key_id in self.get_substring_candidates(query):
+                key = self.keys[key_id]
+                if key_id in ranks or query not in key:
+                    continue
+                ranks[key_id] = (WORD_PREFIX_RANK
+                                 if (" " + key).find(" " + query) >= 0 else
+                                 SUBSTRING_RANK)
+        # misspellings are only looked for when nothing matches exactly
+        if (len(ranks) < max_results and
+                EXACT_RANK not in ranks.values()):
+            for key_id, rank in self.get_fuzzy_ranks(query).items():
+                ranks.setdefault(key_id, rank)
+
+        best_ranks = {}
+        for key_id, rank in ranks.items():
+            entry_id = self.key_entries[key_id]
+            best_ranks[entry_id] = min(rank, best_ranks.get(entry_id, rank))
+        entry_ids = sorted(best_ranks, key=lambda entry_id: (
+            best_ranks[entry_id], self.entries[entry_id].order,
+            self.entries[entry_id].text))
+        return [self.entries[entry_id]
+                for entry_id in entry_ids[:max_results]]
+
+    def find(self, text):
+        results = self.search(text, 1)
+        return results[0] if results else None
+
+
+def get_constellation_entries(stars3d):
+    for name in stars3d.constellation_names:
+        yield Entry(name, name), [name]
+
+
+def get_star_entries(stars3d, root_path):
+    seen = set()
+    for file in parser.get_catalog_files(root_path):
+        for constellation, abbreviation, occurrence, hd, flamsteed, bayer in \
+                parser.parse_file_designations(root_path, file):
+            constellation_id = stars3d.get_constellation_id(constellation)
+            star_index = stars3d.find_star(
+                constellation_id,
+                parser.parse_catalog_coordinates(occurrence))
+            if star_index is None or star_index in seen:
+                continue
+            seen.add(star_index)
+
+            names = []
+            if bayer:
+                names.extend(name + " " + suffix
+                             for name in get_bayer_names(bayer)
+                             for suffix in (abbreviation, constellation))
+            if flamsteed:
+                names.extend(flamsteed + " " + suffix
+                             for suffix in (abbreviation, constellation))
+            if hd:
+                names.extend(("HD " + hd, "HD" + hd))
+            if not names:
+                continue
+
+            text = names[0]
+            if hd and not text.startswith("HD"):
+                text += " (HD " + hd + ")"
+            # brighter stars go first among equally good matches
+            yield (Entry(text, constellation, star_index, 1 + star_index),
+                   [text] + names)
+
+
+def build_search_index(stars3d, root_path):
+    entries = list(get_constellation_entries(stars3d))
+    entries.extend(get_star_entries(stars3d, root_path))
+    return SearchIndex(entries)
@@ -4,31 +4,62 @@ __author__ = 'borozdin'
 from PyQt5 import QtCore, QtWidgets
 
 
+SEARCH_DELAY = 150
+
+
 class SearchWindow(QtWidgets.QWidget):
-    def __init__(self, text, words, update_function,
+    # the query runs once typing pauses, and the window reports a result
+    # only when the best match changes
+    def __init__(self, text, search_index, update_function,
                  coordinate_x, coordinate_y, parent=None):
         super().__init__(parent)
 
+        self.search_index = search_index
+        self.update_function = update_function
+        self.target = search_index.find(text)
+
         self.setWindowFlags(QtCore.Qt.Popup)
         self.move(coordinate_x, coordinate_y)
 
         layout = QtWidgets.QHBoxLayout(self)
 
-        completer = QtWidgets.QCompleter(words, self)
-        completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.results_model = QtCore.QStringListModel(self)
+        self.completer = QtWidgets.QCompleter(self.results_model, self)
+        self.completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.completer.setCompletionMode(
+            QtWidgets.QCompleter.UnfilteredPopupCompletion)
+
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.run_search)
 
         self.search_edit = QtWidgets.QLineEdit(text, self)
-        self.search_edit.setCompleter(completer)
-        self.search_edit.textChanged.connect(update_function)
+        self.search_edit.setCompleter(self.completer)
+        self.search_edit.textChanged.connect(self.search_timer.start)
         self.search_edit.setFocus()
         layout.addWidget(self.search_edit)
 
         self.clear_button = QtWidgets.QPushButton("X", self)
-        self.clear_button.setFixedWidth(self.width() / 4)
+        self.clear_button.setFixedWidth(self.width() // 4)
         self.clear_button.clicked.connect(self.clear_button_pressed)
         layout.addWidget(self.clear_button)
 
-        update_function(self.search_edit.text())
+    def run_search(self):
+        self.search_timer.stop()
+        text = self.search_edit.text()
+        results = self.search_index.search(text)
+
+        self.results_model.setStringList(
+            [result.text for result in results])
+        if results and results[0].text != text and \
+                self.search_edit.hasFocus():
+            self.completer.complete()
+
+        target = results[0] if results else None
+        if target != self.target:
+            self.target = target
+            self.update_function(text, target)
 
     def clear_button_pressed(self):
         self.search_edit.setText("")
@@ -37,4 +68,6 @@ class SearchWindow(QtWidgets.QWidget):
     def keyPressEvent(self, event):
         key = event.key()
         if key == QtCore.Qt.Key_Return:
+            if self.search_timer.isActive():
+                self.run_search()
             self.close()
@@ -0,0 +1,134 @@
+__author__ = 'borozdin'
+
+import math
+import numpy
+
+
+STARS_PER_CELL = 16
+MAX_BANDS_COUNT = 1024
+QUERY_MARGIN = 1e-6
+
+
+def search_cutoffs(sorted_values, starts, ends, threshold):
+    # binary search in all the sorted runs [starts[i], ends[i]) at once
+    lefts = starts.copy()
+    rights = ends.copy()
+    active = lefts < rights
+    while numpy.any(active):
+        middles = (lefts + rights) // 2
+        passed = sorted_values[numpy.where(active, middles, 0)] <= threshold
+        lefts = numpy.where(active & passed, middles + 1, lefts)
+        rights = numpy.where(active & ~passed, middles, rights)
+        active = lefts < rights
+    return lefts
+
+
+def get_runs_positions(starts, counts):
+    # positions of all the runs [starts[i], starts[i] + counts[i]) in a row
+    shifts = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts)
+    return shifts + numpy.arange(counts.sum())
+
+
+class SkyIndex:
+    def __init__(self, points3d, brightness, bands_count=None):
+        self.points_count = len(points3d)
+        if bands_count is None:
+            bands_count = round(
+                math.sqrt(self.points_count / STARS_PER_CELL / 2))
+        self.bands_count = min(MAX_BANDS_COUNT, max(1, bands_count))
+        self.band_height = math.pi / self.bands_count
+
+        # cells of every band are about as wide as they are high
+        band_latitudes = (-math.pi / 2 + self.band_height *
+                          (numpy.arange(self.bands_count) + 0.5))
+        self.buckets_counts = numpy.maximum(1, numpy.ceil(
+            2 * self.bands_count * numpy.cos(band_latitudes))).astype(int)
+        self.band_offsets = numpy.concatenate(
+            ([0], numpy.cumsum(self.buckets_counts)))
+
+        lengths = numpy.sqrt((points3d ** 2).sum(axis=1))
+        lengths[lengths == 0] = 1
+        latitudes = numpy.arcsin(numpy.clip(
+            points3d[:, 2] / lengths, -1, 1))
+        longitudes = numpy.arctan2(points3d[:, 1], points3d[:, 0])
+
+        bands = self.get_bands(latitudes)
+        buckets = numpy.floor(
+            numpy.mod(longitudes, 2 * math.pi) / (2 * math.pi) *
+            self.buckets_counts[bands]).astype(int)
+        buckets = numpy.minimum(buckets, self.buckets_counts[bands] - 1)
+        cells = self.band_offsets[bands] + buckets
+
+        # stars of every cell go from the brightest to the faintest
+        self.order = numpy.lexsort((brightness, cells))
+        self.sorted_brightness = brightness[self.order]
+        self.cell_starts = numpy.searchsorted(
+            cells[self.order], numpy.arange(self.band_offsets[-1] + 1))
+
+    def get_bands(self, latitudes):
+        bands = numpy.floor((numpy.asarray(latitudes) + math.pi / 2) /
+                            self.band_height).astype(int)
+        return numpy.clip(bands, 0, self.bands_count - 1)
+
+    def get_cell_ranges(self, view_vector3d, view_angle):
+        radius = view_angle + QUERY_MARGIN
+        center = view_vector3d.normalize()
+        latitude = math.asin(min(1, max(-1, center.z)))
+        longitude = math.atan2(center.y, center.x)
+
+        latitude_min = latitude - radius
+        latitude_max = latitude + radius
+        whole_bands = latitude_min <= -math.pi / 2 or \
+            latitude_max >= math.pi / 2
+        if not whole_bands:
+            half_width = math.asin(
+                min(1, math.sin(radius) / math.cos(latitude)))
+
+        cell_ranges = []
+        for band in range(int(self.get_bands(latitude_min)),
+                          int(self.get_bands(latitude_max)) + 1):
+            offset = int(self.band_offsets[band])
+            count = int(self.buckets_counts[band])
+            if whole_bands:
+                cell_ranges.append((offset, offset + count))
+                continue
+
+            first_bucket = math.floor(
+                (longitude - half_width) / (2 * math.pi) * count)
+            last_bucket = math.floor(
+                (longitude + half_width) / (2 * math.pi) * count)
+            if last_bucket - first_bucket + 1 >= count:
+                cell_ranges.append((offset, offset + count))
+                continue
+
+            first_bucket %= count
+            last_bucket %= count
+            if first_bucket <= last_bucket:
+                cell_ranges.append(
+                    (offset + first_bucket, offset + last_bucket + 1))
+            else:
+                cell_ranges.append((offset + first_bucket, offset + count))
+                cell_ranges.append((offset, offset + last_bucket + 1))
+
+        return cell_ranges
+
+    def get_brightest_in_cells(self, count):
+        counts = numpy.minimum(numpy.diff(self.cell_starts), count)
+        return numpy.sort(self.order[
+            get_runs_positions(self.cell_starts[:-1], counts)])
+
+    def query(self, view_vector3d, view_angle, brightness_threshold=None):
+        cell_ranges = self.get_cell_ranges(view_vector3d, view_angle)
+        if not cell_ranges:
+            return numpy.zeros(0, dtype=int)
+        cells = numpy.concatenate(
+            [numpy.arange(first, last) for first, last in cell_ranges])
+
+        starts = self.cell_starts[cells]
+        ends = self.cell_starts[cells + 1]
+        if brightness_threshold is not None:
+            ends = search_cutoffs(
+                self.sorted_brightness, starts, ends, brightness_threshold)
+
+        return numpy.sort(self.order[
+            get_runs_positions(starts, ends - starts)])
@@ -1,6 +1,71 @@
 __author__ = 'borozdin'
 
 from PyQt5 import QtGui
+import numpy
+
+
+SPECTRAL_CLASSES = "OBAFGKM"
+# the colour of every spectral class at full brightness, the last one is
+# for stars of other or unknown classes
+CLASS_COLORS = (
+    (0, 0.5, 1), (0, 0.5, 1), (0.75, 0.85, 1), (1, 1, 0.75),
+    (1, 1, 0), (1, 1, 0), (1, 0.5, 0), (1, 1, 1))
+UNKNOWN_CLASS = len(SPECTRAL_CLASSES)
+# the letter of stars whose spectral class is not given
+UNKNOWN_SPECTRAL_LETTER = "?"
+# upper bounds of B-V for the spectral classes but the last one
+COLOR_INDEX_BOUNDS = (-0.3, -0.02, 0.3, 0.58, 0.81, 1.4)
+INTENSITY_LEVELS = 256
+
+
+def get_color_table():
+    # colours of every class for every visible brightness as QRgb values
+    brightness = numpy.arange(0, INTENSITY_LEVELS)
+    table = numpy.zeros((len(CLASS_COLORS), INTENSITY_LEVELS),
+                        dtype=numpy.uint32)
+    for color_class, components in enumerate(CLASS_COLORS):
+        red, green, blue = (
+            (brightness * component).astype(numpy.uint32)
+            for component in components)
+        table[color_class] = 0xff000000 | red << 16 | green << 8 | blue
+    return table
+
+
+COLOR_TABLE = get_color_table()
+
+
+def get_color_classes(colors, color_indices=None):
+    # the spectral letter gives the class unless the colour index is known
+    letters = numpy.frombuffer(SPECTRAL_CLASSES.encode(), dtype=numpy.uint8)
+    lookup = numpy.full(256, UNKNOWN_CLASS, dtype=numpy.uint8)
+    lookup[letters] = numpy.arange(len(letters))
+    color_classes = lookup[numpy.asarray(colors, dtype=numpy.uint8)]
+
+    if color_indices is not None:
+        known = numpy.isfinite(color_indices)
+        color_classes[known] = numpy.searchsorted(
+            COLOR_INDEX_BOUNDS, color_indices[known])
+    return color_classes
+
+
+def get_intensities(brightness):
+    # magnitudes rounded to one of 256 steps between the brightest and the
+    # faintest star, and the magnitude of every step
+    if not len(brightness):
+        return numpy.zeros(0, dtype=numpy.uint8), numpy.zeros(
+            INTENSITY_LEVELS)
+    brightest = float(brightness.min())
+    step = max(float(brightness.max()) - brightest, 1e-9) / (
+        INTENSITY_LEVELS - 1)
+    intensities = numpy.round((brightness - brightest) / step).astype(
+        numpy.uint8)
+    return intensities, brightest + numpy.arange(0, INTENSITY_LEVELS) * step
+
+
+def get_color(color, visible_brightness):
+    color_class = get_color_classes(numpy.array([ord(color)]))[0]
+    return QtGui.QColor.fromRgba(
+        int(COLOR_TABLE[color_class, visible_brightness]))
 
 
 class Star:
@@ -12,11 +77,40 @@ class Star:
         self.tooltip = tooltip
 
     def get_color(self, visible_brightness):
-        if self.color == "O" or self.color == "B":
-            return QtGui.QColor(0, visible_brightness / 2, visible_brightness)
-        if self.color == "G" or self.color == "K":
-            return QtGui.QColor(visible_brightness, visible_brightness, 0)
-        if self.color == "M":
-            return QtGui.QColor(visible_brightness, visible_brightness / 2, 0)
-        return QtGui.QColor(
-            visible_brightness, visible_brightness, visible_brightness)
+        return get_color(self.color, visible_brightness)
+
+
+class ProjectedStars:
+    def __init__(self, stars3d, indices, points):
+        self.stars3d = stars3d
+        self.indices = indices
+        self.points = points
+        self.brightness = stars3d.brightness[indices]
+        self.color_classes = stars3d.color_classes[indices]
+        self.intensities = stars3d.intensities[indices]
+        self.constellation_ids = stars3d.constellation_ids[indices]
+        # the brightest star sets the scale of the others
+        self.max_brightness = (float(self.brightness.min())
+                               if len(indices) else None)
+
+    def get_positions(self, catalog_indices):
+        # both the projected indices and the catalog ranges are sorted
+        positions = numpy.searchsorted(self.indices, catalog_indices)
+        inside = positions < len(self.indices)
+        positions = positions[inside]
+        return positions[self.indices[positions] == catalog_indices[inside]]
+
+    def get_constellation(self, position):
+        return self.stars3d.get_constellation_name(
+            self.constellation_ids[position])
+
+    def get_tooltip(self, position):
+        return self.stars3d.get_tooltip(self.indices[position])
+
+    def get_memory_usage(self):
+        return (self.indices.nbytes + self.points.nbytes +
+                self.brightness.nbytes + self.color_classes.nbytes +
+                self.intensities.nbytes + self.constellation_ids.nbytes)
+
+    def __len__(self):
+        return len(self.indices)
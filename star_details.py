@@ -0,0 +1,181 @@
+__author__ = 'borozdin'
+
+import collections
+import html
+import re
+import parser
+
+
+CACHE_SIZE = 64
+TAG_RE = re.compile(r"<[^>]*>")
+NOTE_RE = re.compile(r"^\(\s*(\d+)\)(.*)")
+NOTES_ANCHOR = b'name="notes"'
+STAR_TYPES = {"D": "double", "V": "variable"}
+
+
+def strip_tags(line):
+    # some pages pad the columns with non-breaking spaces
+    text = TAG_RE.sub("", line.decode("latin-1"))
+    if "&" in text:
+        text = html.unescape(text).replace("\xa0", " ")
+    return text.rstrip()
+
+
+def get_page_files(root_path):
+    return sorted({parser.get_constellation_page(file)
+                   for file in parser.get_catalog_files(root_path)})
+
+
+def parse_details(line):
+    fields = collections.OrderedDict()
+    # the type letter is not always in its column
+    type_and_magnitude = line[parser.TYPE_MAGNITUDE_COLUMNS].split()
+    fields["magnitude"] = type_and_magnitude[-1]
+    fields["type"] = "".join(type_and_magnitude[:-1])
+    fields["spectrum"] = line[parser.SPECTRUM_COLUMNS].strip()
+    fields["galactic"] = tuple(line[columns].strip()
+                               for columns in parser.GALACTIC_COLUMNS)
+    fields["proper_motion"] = tuple(
+        line[columns].strip() for columns in parser.PROPER_MOTION_COLUMNS)
+    fields["radial_velocity"] = line[parser.RADIAL_VELOCITY_COLUMNS].strip()
+    fields["hd"] = line[parser.HD_COLUMNS].strip()
+    fields["flamsteed"] = line[parser.FLAMSTEED_COLUMNS].strip()
+    fields["bayer"] = line[parser.BAYER_COLUMNS].replace(" ", "")
+    note = NOTE_RE.match(line[parser.NOTE_COLUMNS].strip())
+    fields["note"] = note.group(1) if note else ""
+    return fields
+
+
+def format_details(tooltip, constellation, fields):
+    lines = [tooltip]
+    names = " ".join(name for name in (fields["flamsteed"], fields["bayer"])
+                     if name)
+    if names:
+        lines.append(names + " " + constellation)
+    else:
+        lines.append(constellation)
+    if fields["hd"]:
+        lines.append("HD " + fields["hd"])
+    lines.append("m: " + fields["magnitude"] +
+                 ("  " + STAR_TYPES[fields["type"]]
+                  if fields["type"] in STAR_TYPES else ""))
+    if fields["spectrum"]:
+        lines.append("Sp: " + fields["spectrum"])
+    lines.append("l: {}  b: {}".format(*fields["galactic"]))
+    if any(fields["proper_motion"]):
+        lines.append("Proper motion: {} {} \"/year".format(
+            *fields["proper_motion"]))
+    if fields["radial_velocity"]:
+        lines.append("Vr: " + fields["radial_velocity"] + " km/s")
+    if fields.get("note_text"):
+        lines.append(fields["note_text"])
+    return "\n".join(lines)
+
+
+class StarDetails:
+    # the constellation pages have a line of the full catalog for every
+    # star; only where those lines begin is kept, and the lines of recently
+    # shown stars are parsed and kept in a small cache
+    def __init__(self, stars3d, root_path, cache_size=CACHE_SIZE):
+        self.stars3d = stars3d
+        self.root_path = root_path
+        self.cache_size = cache_size
+
+        # pages are indexed one by one, when a star of theirs is shown
+        self.constellation_pages = None
+        self.indexed_pages = set()
+        self.offsets = {}
+        self.note_offsets = {}
+        self.cache = collections.OrderedDict()
+        self.hits_count = 0
+        self.misses_count = 0
+
+    def get_pages(self, constellation_id):
+        if self.constellation_pages is None:
+            self.constellation_pages = collections.defaultdict(list)
+            for page in get_page_files(self.root_path):
+                self.constellation_pages[self.stars3d.get_constellation_id(
+                    parser.get_constellation_name(self.root_path, page))
+                ].append(page)
+        return self.constellation_pages.get(constellation_id, [])
+
+    def index_page(self, page, constellation_id):
+        offset = 0
+        with open(self.root_path + page, "rb") as file:
+            for line in file:
+                if NOTES_ANCHOR in line.lower():
+                    self.note_offsets[page] = offset + len(line)
+                    break
+                occurrence = re.match(parser.COORDINATES_RE,
+                                      strip_tags(line))
+                if occurrence is not None:
+                    index = self.stars3d.find_star(
+                        constellation_id, parser.parse_catalog_coordinates(
+                            occurrence.groups()))
+                    if index is not None:
+                        self.offsets.setdefault(index, (page, offset))
+                offset += len(line)
+        self.indexed_pages.add(page)
+
+    def find_line(self, index):
+        constellation_id = int(self.stars3d.constellation_ids[index])
+        for page in self.get_pages(constellation_id):
+            if page not in self.indexed_pages:
+                self.index_page(page, constellation_id)
+        return self.offsets.get(index)
+
+    def read_note(self, file, page, note):
+        # a note starts with its number in brackets and goes on until the
+        # next one or the end of the section
+        if page not in self.note_offsets:
+            return ""
+        file.seek(self.note_offsets[page])
+        text = []
+        for line in file:
+            line = strip_tags(line).strip()
+            occurrence = NOTE_RE.match(line)
+            if occurrence is not None:
+                if text:
+                    break
+                if occurrence.group(1) == note:
+                    text.append(occurrence.group(2).strip())
+            elif text:
+                if not line:
+                    break
+                text.append(line)
+        return " ".join(text)
+
+    def load(self, page, offset):
+        with open(self.root_path + page, "rb") as file:
+            file.seek(offset)
+            fields = parse_details(strip_tags(file.readline()))
+            if fields["note"]:
+                fields["note_text"] = self.read_note(
+                    file, page, fields["note"])
+        return fields
+
+    def get_fields(self, index):
+        if index in self.cache:
+            self.hits_count += 1
+            self.cache.move_to_end(index)
+            return self.cache[index]
+
+        line = self.find_line(index)
+        if line is None:
+            return None
+
+        self.misses_count += 1
+        fields = self.load(*line)
+        self.cache[index] = fields
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return fields
+
+    def get_text(self, index):
+        tooltip = self.stars3d.get_tooltip(index)
+        fields = self.get_fields(index)
+        if fields is None:
+            return tooltip
+        return format_details(
+            tooltip, self.stars3d.get_constellation_name(
+                self.stars3d.constellation_ids[index]), fields)
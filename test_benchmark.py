@@ -0,0 +1,45 @@
+__author__ = 'borozdin'
+
+import json
+import unittest
+import numpy
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generate_catalog(self):
+        stars3d = benchmark.generate_catalog(5000)
+        self.assertEqual(len(stars3d), 5000)
+        self.assertTrue(numpy.all(numpy.diff(stars3d.brightness) >= 0))
+        self.assertTrue(numpy.allclose(
+            (stars3d.points ** 2).sum(axis=1), 1))
+        # fainter stars are more numerous
+        self.assertLess(stars3d.get_bright_count(3),
+                        stars3d.get_bright_count(5) / 5)
+
+    def test_camera_paths(self):
+        for moves in benchmark.get_camera_paths(10).values():
+            self.assertEqual(len(moves), 10)
+            self.assertTrue(all(len(move) == 4 for move in moves))
+
+    def test_run_benchmarks(self):
+        results = benchmark.run_benchmarks(
+            sizes=[2000], real_path=None, frames_count=3,
+            path_names=["pan", "zoom"])
+        results = json.loads(json.dumps(results))
+
+        self.assertEqual(len(results["results"]), 1)
+        result = results["results"][0]
+        self.assertEqual(result["stars"], 2000)
+        self.assertIn("level_of_detail", result["stages"])
+        self.assertEqual(sorted(result["paths"]), ["pan", "zoom"])
+        for path in result["paths"].values():
+            for stage in ("move", "projection", "cached_projection",
+                          "full_projection", "opengl_frame", "pick_index",
+                          "pick", "render"):
+                self.assertEqual(path[stage]["count"], 3)
+                self.assertGreaterEqual(path[stage]["p95_ms"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+__author__ = 'borozdin'
+
+import math
+import unittest
+import numpy
+from PyQt5.QtGui import QColor
+import parser
+from catalog import Catalog, format_tooltip
+import star
+from star import Star
+from geometry import Vector3D, ViewArea, project_visible_points
+
+
+class TestCatalog(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stars3d = parser.parse_stars3d("stars/")
+        cls.catalog = parser.parse_catalog("stars/")
+
+    def test_columns(self):
+        self.assertEqual(len(self.catalog), len(self.stars3d))
+        self.assertTrue(numpy.all(numpy.diff(self.catalog.brightness) >= 0))
+        self.assertEqual(self.catalog.points.shape, (len(self.stars3d), 3))
+        self.assertEqual(self.catalog.colors.dtype, numpy.uint8)
+
+    def test_render_attributes(self):
+        self.assertEqual(self.catalog.color_classes.dtype, numpy.uint8)
+        self.assertEqual(
+            [star.SPECTRAL_CLASSES[color_class] for color_class
+             in self.catalog.color_classes[:3].tolist()],
+            [chr(color) for color in self.catalog.colors[:3].tolist()])
+        self.assertEqual(self.catalog.intensities.dtype, numpy.uint8)
+        self.assertTrue(numpy.all(numpy.diff(
+            self.catalog.intensities.astype(int)) >= 0))
+        self.assertEqual(self.catalog.intensities[-1], 255)
+        self.assertTrue(numpy.allclose(
+            self.catalog.intensity_magnitudes[[0, -1]],
+            self.catalog.brightness[[0, -1]]))
+        self.assertTrue(numpy.all(numpy.isnan(self.catalog.color_indices)))
+
+    def test_color_classes(self):
+        letters = numpy.frombuffer(b"OBAFGKMCW", dtype=numpy.uint8)
+        self.assertEqual(star.get_color_classes(letters).tolist(),
+                         [0, 1, 2, 3, 4, 5, 6, 7, 7])
+        self.assertEqual(star.get_color_classes(
+            letters[:5], numpy.array([numpy.nan, -0.4, 0.1, 0.65, 1.6])
+        ).tolist(), [0, 0, 2, 4, 6])
+
+    def test_colors(self):
+        self.assertEqual(star.COLOR_TABLE.shape, (8, 256))
+        self.assertEqual(star.get_color("M", 255), QColor(255, 127, 0))
+        self.assertEqual(star.get_color("B", 100), QColor(0, 50, 100))
+        self.assertEqual(star.get_color("X", 50), QColor(50, 50, 50))
+
+    def test_lazy_tooltips_match_source_text(self):
+        self.assertEqual(
+            sorted(star3d.tooltip for star3d in self.stars3d),
+            sorted(self.catalog.get_tooltip(index)
+                   for index in range(0, len(self.catalog))))
+
+    def test_format_tooltip(self):
+        self.assertEqual(format_tooltip(0, 0), "Alf: 0:0:0.0\nDel: +00:0:0")
+        self.assertEqual(format_tooltip(36000 * 23 + 600 + 82, -3600 * 5 - 7),
+                         "Alf: 23:1:8.2\nDel: -05:0:7")
+
+    def test_tooltips_of_stars_without_catalog_coordinates(self):
+        stars3d = Catalog.from_stars([
+            Star(Vector3D(-1, 0, 0), 1, "A", "First", ""),
+            Star(Vector3D(0, -1, -1).normalize(), 2, "A", "Second", "")])
+        self.assertEqual(stars3d.get_tooltip(0), "Alf: 12:0:0.0\nDel: +00:0:0")
+        self.assertEqual(stars3d.get_tooltip(1), "Alf: 18:0:0.0\nDel: -45:0:0")
+
+    def test_projected_stars(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.6)
+        stars2d = project_visible_points(self.catalog, view_area)
+        self.assertGreater(len(stars2d), 0)
+        self.assertEqual(stars2d.points.shape, (len(stars2d), 2))
+        self.assertEqual(stars2d.get_constellation(0),
+                         self.catalog[stars2d.indices[0]].constellation)
+
+    def test_same_stars_as_parse_stars3d(self):
+        stars3d = Catalog.from_stars(self.stars3d)
+        self.assertTrue(numpy.array_equal(stars3d.points, self.catalog.points))
+        self.assertTrue(numpy.array_equal(
+            stars3d.constellation_ids, self.catalog.constellation_ids))
+
+    def test_parallel_parsing(self):
+        stars3d = parser.parse_catalog("stars/", processes=3)
+        for column in ("points", "brightness", "colors",
+                       "constellation_ids", "coordinates"):
+            self.assertTrue(numpy.array_equal(
+                getattr(stars3d, column), getattr(self.catalog, column)))
+        self.assertEqual(stars3d.constellation_names,
+                         self.catalog.constellation_names)
+
+    def test_constellations_centers(self):
+        center, _ = self.catalog.get_constellation_cap(
+            self.catalog.get_constellation_id("Orion"))
+        total = Vector3D(0, 0, 0)
+        for star3d in self.stars3d:
+            if star3d.constellation == "Orion":
+                total += star3d.point
+        self.assertEqual(center, total.normalize())
+
+    def test_constellation_ranges(self):
+        covered = []
+        for constellation_id in range(
+                0, len(self.catalog.constellation_names)):
+            indices = self.catalog.get_constellation_indices(constellation_id)
+            self.assertTrue(numpy.all(numpy.diff(indices) > 0))
+            self.assertTrue(numpy.all(
+                self.catalog.constellation_ids[indices] == constellation_id))
+            covered.extend(indices.tolist())
+        self.assertEqual(sorted(covered), list(range(0, len(self.catalog))))
+
+    def test_constellation_caps(self):
+        for constellation_id, key in enumerate(
+                self.catalog.constellation_names):
+            center, radius = self.catalog.get_constellation_cap(
+                constellation_id)
+            points = [star3d.point for star3d in self.stars3d
+                      if star3d.constellation == key]
+            farthest = min(point % center for point in points)
+            self.assertAlmostEqual(math.cos(radius), farthest)
+
+    def test_enclosing_caps(self):
+        for constellation_id in range(
+                0, len(self.catalog.constellation_names)):
+            center, radius = self.catalog.get_enclosing_cap(constellation_id)
+            points = self.catalog.points[
+                self.catalog.get_constellation_indices(constellation_id)]
+            self.assertTrue(numpy.all(
+                points @ (center.x, center.y, center.z) >=
+                math.cos(radius) - 1e-9))
+            self.assertLessEqual(
+                radius, self.catalog.constellation_radii[constellation_id])
+
+    def test_selection_positions(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 1.2)
+        stars2d = project_visible_points(self.catalog, view_area)
+        for constellation_id in set(stars2d.constellation_ids.tolist()):
+            positions = stars2d.get_positions(
+                self.catalog.get_constellation_indices(constellation_id))
+            self.assertEqual(positions.tolist(), numpy.flatnonzero(
+                stars2d.constellation_ids == constellation_id).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+__author__ = 'borozdin'
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+import catalog_cache
+import parser
+
+
+class TestCatalogCache(unittest.TestCase):
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp() + "/"
+        os.mkdir(self.root_path + "txt")
+        for name in ("and", "ori"):
+            shutil.copy("stars/txt/" + name + ".txt", self.root_path + "txt/")
+            shutil.copy("stars/" + name + ".htm", self.root_path)
+        self.cache_path = self.root_path + catalog_cache.CACHE_FILE_NAME
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def assert_same_catalog(self, first, second):
+        self.assertTrue(numpy.array_equal(first.points, second.points))
+        self.assertTrue(numpy.array_equal(first.brightness, second.brightness))
+        self.assertTrue(numpy.array_equal(first.colors, second.colors))
+        self.assertTrue(numpy.array_equal(
+            first.color_indices, second.color_indices, equal_nan=True))
+        self.assertEqual(
+            [star.constellation for star in first],
+            [star.constellation for star in second])
+
+    def test_cache_is_written_and_mapped(self):
+        parsed = parser.parse_catalog(self.root_path)
+        created = catalog_cache.load_catalog(self.root_path)
+        self.assertTrue(os.path.exists(self.cache_path))
+        self.assert_same_catalog(created, parsed)
+
+        mapped = catalog_cache.read_cache(self.cache_path, self.root_path)
+        self.assertIsInstance(mapped.points, numpy.memmap)
+        self.assert_same_catalog(mapped, parsed)
+
+    def test_touched_sources_keep_cache(self):
+        catalog_cache.load_catalog(self.root_path)
+        os.utime(self.root_path + "txt/and.txt", (0, 0))
+        self.assertIsNotNone(
+            catalog_cache.read_cache(self.cache_path, self.root_path))
+
+    def test_changed_sources_invalidate_cache(self):
+        catalog_cache.load_catalog(self.root_path)
+        with open(self.root_path + "txt/ori.txt", "a") as text:
+            text.write("\n")
+        self.assertIsNone(
+            catalog_cache.read_cache(self.cache_path, self.root_path))
+
+        os.remove(self.root_path + "txt/ori.txt")
+        stars3d = catalog_cache.load_catalog(self.root_path)
+        self.assertEqual(list(stars3d.constellation_names), ["Andromeda"])
+
+    def test_broken_cache_is_rebuilt(self):
+        with open(self.cache_path, "wb") as cache:
+            cache.write(b"garbage")
+        stars3d = catalog_cache.load_catalog(self.root_path)
+        self.assertEqual(len(stars3d), len(parser.parse_stars3d(
+            self.root_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
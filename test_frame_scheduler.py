@@ -0,0 +1,70 @@
+__author__ = 'borozdin'
+
+import os
+import sys
+import time
+import unittest
+from PyQt5 import QtCore, QtGui
+from frame_scheduler import FrameScheduler
+
+
+def get_application():
+    # one GUI application serves all the tests, whatever their order; the
+    # default platform aborts the process without a display
+    application = QtCore.QCoreApplication.instance()
+    if application is None:
+        arguments = sys.argv[:1]
+        if not any(os.environ.get(name) for name in (
+                "DISPLAY", "WAYLAND_DISPLAY", "QT_QPA_PLATFORM")):
+            arguments += ["-platform", "offscreen"]
+        application = QtGui.QGuiApplication(arguments)
+    return application
+
+
+class TestFrameScheduler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.application = get_application()
+
+    def setUp(self):
+        self.frames = []
+        self.scheduler = FrameScheduler(
+            lambda: self.frames.append(time.perf_counter()), fps=50)
+
+    def wait(self, seconds):
+        finish = time.perf_counter() + seconds
+        while time.perf_counter() < finish:
+            self.application.processEvents()
+            time.sleep(0.001)
+
+    def test_requests_are_merged(self):
+        for request in range(0, 10):
+            self.scheduler.request()
+        self.wait(0.05)
+        self.assertEqual(len(self.frames), 1)
+        self.assertEqual(self.scheduler.get_merged_count(), 9)
+
+    def test_frames_are_spaced(self):
+        for request in range(0, 30):
+            self.scheduler.request()
+            self.wait(0.005)
+        self.wait(0.05)
+        self.assertGreater(len(self.frames), 1)
+        self.assertLess(len(self.frames), 15)
+        for previous, current in zip(self.frames, self.frames[1:]):
+            self.assertGreaterEqual(current - previous, 0.015)
+
+    def test_flush(self):
+        self.scheduler.request()
+        self.scheduler.flush()
+        self.assertEqual(len(self.frames), 1)
+        self.scheduler.flush()
+        self.assertEqual(len(self.frames), 1)
+
+    def test_fps(self):
+        self.scheduler.set_fps(120)
+        self.assertAlmostEqual(self.scheduler.get_fps(), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,13 @@ __author__ = 'borozdin'
 
 import unittest
 from geometry import Vector2D, Vector3D, fit_in_segment, map_value, \
-    get_intersection
+    Quaternion, ViewTransition, get_smallest_enclosing_cap, \
+    get_fitting_view_angle, MAX_VIEW_ANGLE, \
+    get_intersection, ViewArea, project_visible_points
+from catalog import Catalog
+from star import Star
 import math
+import random
 
 
 class TestGeometryUtilities(unittest.TestCase):
@@ -194,5 +199,286 @@ class TestIntersectionOfLineAndSurface(unittest.TestCase):
             Vector3D(1, 1, 0))
 
 
+def generate_stars(count, seed=0):
+    generator = random.Random(seed)
+    stars = []
+    for index in range(0, count):
+        point = Vector3D.convert_from_spherical_coordinates(
+            math.degrees(math.asin(generator.uniform(-1, 1))),
+            generator.uniform(0, 360))
+        stars.append(Star(point, generator.uniform(-1, 7),
+                          generator.choice("OBAFGKM"),
+                          "C" + str(index % 10), str(index)))
+    return stars
+
+
+def project_visible_points_one_by_one(stars3d, view_area):
+    projected_stars2d = []
+    cos_view_angle = math.cos(view_area.view_angle)
+    sin_view_angle = math.sin(view_area.view_angle)
+    for index, star3d in enumerate(stars3d):
+        if star3d.brightness > view_area.get_brightness_threshold():
+            continue
+        point2d = view_area.project_point3d(
+            star3d.point, cos_view_angle, sin_view_angle)
+        if point2d is not None:
+            projected_stars2d.append((index, point2d))
+    return projected_stars2d
+
+
+def project_point3d_by_intersection(view_area, point3d):
+    cos_view_angle = math.cos(view_area.view_angle)
+    sin_view_angle = math.sin(view_area.view_angle)
+    if point3d % view_area.view_vector3d < cos_view_angle:
+        return None
+
+    surface_point3d = view_area.view_vector3d * cos_view_angle
+    direction_vector1 = view_area.rotation_vector3d
+    direction_vector2 = view_area.view_vector3d * direction_vector1
+    pointing_vector = get_intersection(
+        point3d, Vector3D(0, 0, 0), surface_point3d,
+        surface_point3d + direction_vector1,
+        surface_point3d + direction_vector2) - surface_point3d
+    if pointing_vector.length2() > sin_view_angle ** 2:
+        return None
+    return Vector2D(pointing_vector % direction_vector1,
+                    pointing_vector % direction_vector2) / sin_view_angle
+
+
+class TestViewAreaBasis(unittest.TestCase):
+    def assert_same_as_intersection(self, view_area):
+        for star3d in generate_stars(500):
+            expected = project_point3d_by_intersection(view_area, star3d.point)
+            actual = view_area.project_point3d(
+                star3d.point, math.cos(view_area.view_angle),
+                math.sin(view_area.view_angle))
+            self.assertEqual(actual is None, expected is None)
+            if expected is not None:
+                self.assertEqual(actual, expected)
+
+    def test_matches_intersection(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.8)
+        self.assert_same_as_intersection(view_area)
+        view_area.move(0.4, -0.3, 0.2, 0.3)
+        self.assert_same_as_intersection(view_area)
+
+    def test_not_orthogonal_rotation_vector(self):
+        self.assert_same_as_intersection(ViewArea(
+            Vector3D(1, 1, 1).normalize(), Vector3D(0, 2, 0.5), 1.2))
+
+    def test_basis_is_updated_after_move(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.8)
+        basis = view_area.get_basis()
+        self.assertIs(view_area.get_basis(), basis)
+        view_area.move(0.1, 0, 0, 0)
+        self.assertIsNot(view_area.get_basis(), basis)
+        self.assertEqual(view_area.get_basis()[0], view_area.view_vector3d)
+
+
+def move_by_vectors(view_vector3d, rotation_vector3d, delta_up, delta_right,
+                    delta_rotation):
+    view_vector3d = view_vector3d.rotate(-delta_up, rotation_vector3d)
+    rotation_vector3d = rotation_vector3d.rotate_orthogonal(view_vector3d)
+    view_vector3d = view_vector3d.rotate(delta_right, rotation_vector3d)
+    rotation_vector3d = -rotation_vector3d.rotate_orthogonal(view_vector3d)
+    rotation_vector3d = rotation_vector3d.rotate(delta_rotation, view_vector3d)
+    return view_vector3d.normalize(), rotation_vector3d.normalize()
+
+
+class TestQuaternion(unittest.TestCase):
+    def test_rotate(self):
+        rotation = Quaternion.from_axis_angle(Vector3D(0, 0, 2), math.pi / 2)
+        self.assertEqual(rotation.rotate(Vector3D(1, 0, 0)),
+                         Vector3D(0, 1, 0))
+        self.assertEqual((rotation * rotation).rotate(Vector3D(1, 0, 0)),
+                         Vector3D(-1, 0, 0))
+
+    def test_from_frame(self):
+        generator = random.Random(0)
+        for attempt in range(0, 100):
+            view_vector3d = Vector3D(*[generator.uniform(-1, 1)
+                                       for coordinate in range(0, 3)])
+            view_vector3d = view_vector3d.normalize()
+            rotation_vector3d = (view_vector3d * Vector3D(
+                generator.uniform(-1, 1), generator.uniform(-1, 1), 1))
+            rotation_vector3d = rotation_vector3d.normalize()
+            orientation = Quaternion.from_frame(
+                view_vector3d, rotation_vector3d)
+            self.assertEqual(orientation.rotate(Vector3D(0, 0, 1)),
+                             view_vector3d)
+            self.assertEqual(orientation.rotate(Vector3D(0, 1, 0)),
+                             rotation_vector3d)
+            self.assertEqual(orientation.get_view_vectors()[0],
+                             view_vector3d)
+            self.assertEqual(orientation.get_view_vectors()[1],
+                             rotation_vector3d)
+
+    def test_slerp(self):
+        start = Quaternion(1, 0, 0, 0)
+        end = Quaternion.from_axis_angle(Vector3D(0, 1, 0), 2)
+        self.assertEqual(start.slerp(end, 0), start)
+        self.assertEqual(start.slerp(end, 1), end)
+        self.assertEqual(start.slerp(end, 0.25),
+                         Quaternion.from_axis_angle(Vector3D(0, 1, 0), 0.5))
+        self.assertEqual(start.slerp(-end, 0.5),
+                         Quaternion.from_axis_angle(Vector3D(0, 1, 0), 1))
+
+
+class TestViewAreaMove(unittest.TestCase):
+    def test_matches_rotation_of_vectors(self):
+        view_area = ViewArea(Vector3D(1, 2, 3).normalize(),
+                             Vector3D(2, -1, 0).normalize(), 0.5)
+        view_vector3d = view_area.view_vector3d
+        rotation_vector3d = view_area.rotation_vector3d
+        generator = random.Random(0)
+        for step in range(0, 200):
+            deltas = [generator.uniform(-0.3, 0.3) for delta in range(0, 3)]
+            view_area.move(*deltas, 0)
+            view_vector3d, rotation_vector3d = move_by_vectors(
+                view_vector3d, rotation_vector3d, *deltas)
+            self.assertEqual(view_area.view_vector3d, view_vector3d)
+            self.assertEqual(view_area.rotation_vector3d, rotation_vector3d)
+
+    def test_vectors_stay_orthonormal(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.5)
+        for step in range(0, 10000):
+            view_area.move(0.01, 0.02, 0.03, 0)
+        self.assertAlmostEqual(view_area.view_vector3d.length(), 1, 12)
+        self.assertAlmostEqual(view_area.rotation_vector3d.length(), 1, 12)
+        self.assertAlmostEqual(
+            view_area.view_vector3d % view_area.rotation_vector3d, 0, 12)
+
+    def test_replaced_vectors(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.5)
+        view_area.move(0.2, 0, 0, 0)
+        view_area.view_vector3d = Vector3D(1, 0, 0)
+        view_area.rotation_vector3d = Vector3D(0, 0, 1)
+        view_area.move(0, 0, math.pi / 2, 0)
+        self.assertEqual(view_area.view_vector3d, Vector3D(1, 0, 0))
+        self.assertEqual(view_area.rotation_vector3d, Vector3D(0, 1, 0))
+
+    def test_transition(self):
+        start = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.5)
+        end = ViewArea(Vector3D(1, 0, 0), Vector3D(0, 1, 0), 0.3)
+        transition = ViewTransition(start, end, 10, 2)
+
+        view_area = transition.get_view_area(10)
+        self.assertEqual(view_area.view_vector3d, start.view_vector3d)
+        self.assertAlmostEqual(view_area.view_angle, 0.5)
+        self.assertFalse(transition.is_finished(10))
+
+        view_area = transition.get_view_area(11)
+        self.assertEqual(view_area.view_vector3d,
+                         Vector3D(1, 0, 1).normalize())
+        self.assertEqual(view_area.rotation_vector3d, Vector3D(0, 1, 0))
+        self.assertAlmostEqual(view_area.view_angle, 0.4)
+
+        view_area = transition.get_view_area(13)
+        self.assertEqual(view_area.view_vector3d, end.view_vector3d)
+        self.assertAlmostEqual(view_area.view_angle, 0.3)
+        self.assertTrue(transition.is_finished(13))
+
+
+def get_smallest_cap_by_search(points3d):
+    # every smallest cap has two or three of the points on its border
+    caps = []
+    for first in range(0, len(points3d)):
+        for second in range(first + 1, len(points3d)):
+            center = (points3d[first] + points3d[second]).normalize()
+            caps.append((center, center % points3d[first]))
+            for third in range(second + 1, len(points3d)):
+                center = ((points3d[second] - points3d[first]) *
+                          (points3d[third] - points3d[first])).normalize()
+                if center % points3d[first] < 0:
+                    center = -center
+                caps.append((center, center % points3d[first]))
+    return math.acos(max(
+        cos_radius for center, cos_radius in caps
+        if all(center % point3d >= cos_radius - 1e-9
+               for point3d in points3d)))
+
+
+class TestSmallestEnclosingCap(unittest.TestCase):
+    def generate_cluster(self, generator, count, spread):
+        center = Vector3D(*[generator.uniform(-1, 1)
+                            for coordinate in range(0, 3)])
+        return [(center.normalize() + Vector3D(
+                     *[generator.uniform(-spread, spread)
+                       for coordinate in range(0, 3)])).normalize()
+                for index in range(0, count)]
+
+    def test_matches_search(self):
+        generator = random.Random(0)
+        for attempt in range(0, 30):
+            points3d = self.generate_cluster(
+                generator, generator.randint(1, 12), 0.4)
+            center, radius = get_smallest_enclosing_cap(
+                [(point.x, point.y, point.z) for point in points3d])
+            for point3d in points3d:
+                self.assertGreaterEqual(
+                    center % point3d, math.cos(radius) - 1e-9)
+            if len(points3d) > 1:
+                self.assertAlmostEqual(
+                    radius, get_smallest_cap_by_search(points3d))
+
+    def test_single_point(self):
+        center, radius = get_smallest_enclosing_cap([(0, 1, 0)])
+        self.assertEqual(center, Vector3D(0, 1, 0))
+        self.assertAlmostEqual(radius, 0)
+
+    def test_spread_over_sphere(self):
+        self.assertIsNone(get_smallest_enclosing_cap(
+            [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, 0, 1), (0, 0, -1)]))
+        self.assertIsNone(get_smallest_enclosing_cap([]))
+
+    def test_fitting_view_angle(self):
+        self.assertGreater(get_fitting_view_angle(0.3), 0.3)
+        self.assertEqual(get_fitting_view_angle(3), MAX_VIEW_ANGLE)
+
+
+class TestProjectVisiblePoints(unittest.TestCase):
+    def setUp(self):
+        self.stars3d = generate_stars(3000)
+        self.catalog = Catalog.from_stars(self.stars3d)
+
+    def assert_same_projection(self, view_area):
+        expected = project_visible_points_one_by_one(self.catalog, view_area)
+        stars2d = project_visible_points(self.catalog, view_area)
+        actual = [(index, Vector2D(x, y)) for index, (x, y) in
+                  zip(stars2d.indices.tolist(), stars2d.points.tolist())]
+        self.assertEqual(actual, expected)
+
+    def test_matches_project_point3d(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.6)
+        self.assert_same_projection(view_area)
+        for step in range(0, 20):
+            view_area.move(0.3, 0.2, 0.1, 0.05 * (-1) ** step)
+            self.assert_same_projection(view_area)
+
+    def test_not_orthogonal_rotation_vector(self):
+        view_area = ViewArea(Vector3D(1, 1, 1).normalize(),
+                             Vector3D(0, 1, 0), 1.2)
+        self.assert_same_projection(view_area)
+
+    def test_obligatory_constellation(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.3)
+        self.assertIsNone(project_visible_points(
+            self.catalog, view_area, "C1"))
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 1.5)
+        self.assertIsNotNone(project_visible_points(
+            self.catalog, view_area, "Missing"))
+
+    def test_brightest_stars_go_first(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 1.2)
+        brightness = project_visible_points(
+            self.catalog, view_area).brightness.tolist()
+        self.assertEqual(brightness, sorted(brightness))
+
+    def test_empty_catalog(self):
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.6)
+        self.assertEqual(
+            len(project_visible_points(Catalog.from_stars([]), view_area)), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
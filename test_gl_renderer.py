@@ -0,0 +1,202 @@
+__author__ = 'borozdin'
+
+from PyQt5 import QtGui
+import math
+import unittest
+import numpy
+import benchmark
+import geometry
+import gl_renderer
+import renderer
+from test_frame_scheduler import get_application
+
+
+GL_COLOR_BUFFER_BIT = 0x4000
+
+
+def project_like_shader(vertices, parameters):
+    # the vertex shader for every vertex at once, in screen coordinates of
+    # the sky circle
+    products = numpy.column_stack(
+        (vertices[:, :3], numpy.zeros(len(vertices)))) @ parameters["basis"]
+    offset1, offset2, normal_offset = parameters["view_offsets"]
+    inverse11, inverse12, inverse22 = parameters["inverse_gram"]
+    cos_view_angle = parameters["cos_view_angle"]
+    sin_view_angle = parameters["sin_view_angle"]
+
+    ratios = cos_view_angle * normal_offset / products[:, 3]
+    xs = ratios * products[:, 1] - cos_view_angle * offset1
+    ys = ratios * products[:, 2] - cos_view_angle * offset2
+    visible = ((vertices[:, 3] <= parameters["threshold"]) &
+               (products[:, 0] >= cos_view_angle) &
+               (inverse11 * xs * xs + 2 * inverse12 * xs * ys +
+                inverse22 * ys * ys <= sin_view_angle ** 2))
+    return (numpy.flatnonzero(visible),
+            numpy.column_stack((xs, ys))[visible] / sin_view_angle)
+
+
+class TestGLRenderer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stars3d = benchmark.generate_catalog(20000)
+        cls.vertices = gl_renderer.get_vertices(cls.stars3d)
+
+    def get_view_areas(self):
+        yield geometry.ViewArea(geometry.Vector3D(0, 0, 1),
+                                geometry.Vector3D(0, 1, 0), math.pi / 5)
+        # the rotation vector need not be orthogonal or of unit length
+        yield geometry.ViewArea(geometry.Vector3D(1, 2, -1).normalize(),
+                                geometry.Vector3D(0, 2, 4), 0.3)
+        view_area = geometry.ViewArea(geometry.Vector3D(-1, 0, 0),
+                                      geometry.Vector3D(0, 0, 1), 1)
+        view_area.move(0.3, 0.7, 0.2, -0.5)
+        yield view_area
+
+    def test_vertices(self):
+        self.assertEqual(self.vertices.shape,
+                         (len(self.stars3d), gl_renderer.VERTEX_SIZE))
+        self.assertEqual(self.vertices.dtype, numpy.float32)
+        self.assertTrue(numpy.allclose(self.vertices[:, 3],
+                                       self.stars3d.brightness))
+
+    def test_same_projection_as_view_area(self):
+        for view_area in self.get_view_areas():
+            parameters = gl_renderer.get_frame_parameters(
+                self.stars3d, view_area, 800, 600)
+            stars2d = geometry.project_visible_points(self.stars3d, view_area)
+            indices, points2d = project_like_shader(
+                self.vertices[:parameters["count"]].astype(numpy.float64),
+                parameters)
+
+            self.assertGreater(len(indices), 0)
+            self.assertEqual(indices.tolist(), stars2d.indices.tolist())
+            self.assertTrue(numpy.allclose(points2d, stars2d.points,
+                                           atol=1e-6))
+            self.assertEqual(parameters["max_brightness"],
+                             stars2d.brightness.min())
+
+    def test_brightest_in_narrow_views(self):
+        # some of the views are empty
+        random = numpy.random.RandomState(1)
+        for vector in random.normal(size=(50, 3)).tolist():
+            view_area = geometry.ViewArea(geometry.Vector3D(*vector),
+                                          geometry.Vector3D(0, 0, 1), 0.02)
+            stars2d = geometry.project_visible_points(self.stars3d, view_area)
+            threshold = view_area.get_brightness_threshold()
+            expected = stars2d.brightness.min() if len(stars2d) else threshold
+            self.assertEqual(gl_renderer.get_brightest_visible(
+                self.stars3d, view_area, threshold), expected)
+
+    def test_frame_parameters(self):
+        view_area = next(self.get_view_areas())
+        parameters = gl_renderer.get_frame_parameters(
+            self.stars3d, view_area, 800, 600)
+        self.assertEqual(parameters["scale"], (0.75, -1))
+        self.assertEqual(parameters["count"], self.stars3d.get_bright_count(
+            view_area.get_brightness_threshold()))
+        self.assertEqual(parameters["basis"].shape, (4, 4))
+
+    def test_empty_view(self):
+        stars3d = benchmark.generate_catalog(0)
+        view_area = next(self.get_view_areas())
+        parameters = gl_renderer.get_frame_parameters(
+            stars3d, view_area, 100, 100)
+        self.assertEqual(parameters["count"], 0)
+        self.assertEqual(parameters["max_brightness"],
+                         view_area.get_brightness_threshold())
+
+    def test_shaders(self):
+        self.assertNotIn("%", gl_renderer.VERTEX_SHADER)
+        self.assertIn("LEVELS = {}.0".format(renderer.BRIGHTNESS_LEVELS),
+                      gl_renderer.VERTEX_SHADER)
+
+
+class TestShaders(unittest.TestCase):
+    # the shaders themselves on a real context, where there is one
+    @classmethod
+    def setUpClass(cls):
+        cls.application = get_application()
+        if not isinstance(cls.application, QtGui.QGuiApplication) or \
+                not gl_renderer.is_available():
+            raise unittest.SkipTest("OpenGL {}.{} is not available".format(
+                *gl_renderer.GL_VERSION))
+        cls.context = QtGui.QOpenGLContext()
+        cls.context.setFormat(gl_renderer.get_surface_format())
+        cls.context.create()
+        cls.surface = QtGui.QOffscreenSurface()
+        cls.surface.setFormat(cls.context.format())
+        cls.surface.create()
+        cls.context.makeCurrent(cls.surface)
+        cls.functions = cls.context.versionFunctions(
+            QtGui.QOpenGLVersionProfile(gl_renderer.get_surface_format()))
+        cls.functions.initializeOpenGLFunctions()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.context.doneCurrent()
+
+    def test_link(self):
+        program, linked = gl_renderer.build_program()
+        self.assertTrue(linked, program.log())
+        self.assertEqual(program.attributeLocation("position"), 0)
+
+    def draw_one_by_one(self, vertices, parameters):
+        # every star alone on a single pixel, returns the red of the pixels
+        program, linked = gl_renderer.build_program()
+        self.assertTrue(linked, program.log())
+        framebuffer = QtGui.QOpenGLFramebufferObject(1, 1)
+        framebuffer.bind()
+        buffer = QtGui.QOpenGLBuffer(QtGui.QOpenGLBuffer.VertexBuffer)
+        buffer.create()
+        buffer.bind()
+        buffer.allocate(vertices.tobytes(), vertices.nbytes)
+        program.bind()
+        gl_renderer.set_uniforms(program, parameters, 1)
+        gl_renderer.enable_attributes(program)
+
+        functions = self.functions
+        functions.glViewport(0, 0, 1, 1)
+        functions.glClearColor(0, 0, 0, 1)
+        reds = []
+        for index in range(len(vertices)):
+            functions.glClear(GL_COLOR_BUFFER_BIT)
+            functions.glDrawArrays(gl_renderer.GL_POINTS, index, 1)
+            reds.append(QtGui.qRed(framebuffer.toImage().pixel(0, 0)))
+
+        gl_renderer.disable_attributes(program)
+        program.release()
+        buffer.release()
+        framebuffer.release()
+        return numpy.array(reds)
+
+    def test_brightness_levels(self):
+        # white stars in the middle of the view, some of them brighter
+        # than the brightest visible one and some fainter than the threshold
+        view_area = geometry.ViewArea(geometry.Vector3D(0, 0, 1),
+                                      geometry.Vector3D(0, 1, 0), math.pi / 5)
+        parameters = gl_renderer.get_frame_parameters(
+            benchmark.generate_catalog(0), view_area, 1, 1)
+        threshold = parameters["threshold"]
+        max_brightness = threshold - 4.3
+        parameters["max_brightness"] = max_brightness
+
+        magnitudes = numpy.random.RandomState(0).uniform(
+            max_brightness - 1, threshold + 1, 200).astype(numpy.float32)
+        vertices = numpy.zeros((len(magnitudes), gl_renderer.VERTEX_SIZE),
+                               dtype=numpy.float32)
+        vertices[:, 2] = 1
+        vertices[:, 3] = magnitudes
+        vertices[:, 4:] = 1
+
+        levels = renderer.get_brightness_levels(
+            magnitudes.astype(numpy.float64), threshold, max_brightness)
+        expected = numpy.array([renderer.get_visible_brightness(level)
+                                for level in levels.tolist()])
+        expected[magnitudes > threshold] = 0
+
+        reds = self.draw_one_by_one(vertices, parameters)
+        self.assertLessEqual(numpy.abs(reds - expected).max(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+__author__ = 'borozdin'
+
+import unittest
+import numpy
+from benchmark import generate_catalog
+from geometry import Vector3D, ViewArea, project_visible_points
+from incremental_projection import IncrementalProjection
+from level_of_detail import LevelOfDetail
+
+
+class TestIncrementalProjection(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stars3d = generate_catalog(50000)
+
+    def assert_same_as_full_projection(self, view_area, level_of_detail,
+                                       projection):
+        expected = project_visible_points(
+            self.stars3d, view_area, level_of_detail=level_of_detail)
+        actual = projection.project(view_area)
+        self.assertTrue(numpy.array_equal(actual.indices, expected.indices))
+        self.assertTrue(numpy.array_equal(actual.points, expected.points))
+
+    def drag(self, level_of_detail=None):
+        projection = IncrementalProjection(self.stars3d, level_of_detail)
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.5)
+        for step in range(0, 100):
+            view_area.move(0.01, 0.005, 0, 0)
+            self.assert_same_as_full_projection(
+                view_area, level_of_detail, projection)
+        return projection
+
+    def test_drag_reuses_candidates(self):
+        projection = self.drag()
+        self.assertLess(projection.queries_count, 15)
+
+    def test_drag_with_level_of_detail(self):
+        self.drag(LevelOfDetail(self.stars3d, max_drawn_stars=1000))
+
+    def test_zoom_and_jump(self):
+        projection = IncrementalProjection(self.stars3d)
+        view_area = ViewArea(Vector3D(0, 0, 1), Vector3D(0, 1, 0), 0.5)
+        self.assert_same_as_full_projection(view_area, None, projection)
+        view_area.move(0, 0, 0, 0.1)
+        self.assert_same_as_full_projection(view_area, None, projection)
+        view_area = ViewArea(Vector3D(1, 0, 0), Vector3D(0, 1, 0), 0.6)
+        self.assert_same_as_full_projection(view_area, None, projection)
+        self.assertEqual(projection.queries_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
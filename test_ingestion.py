@@ -0,0 +1,126 @@
+__author__ = 'borozdin'
+
+import os
+import tempfile
+import unittest
+import numpy
+from PyQt5 import QtGui
+import ingestion
+import renderer
+import star
+from geometry import Vector3D
+
+
+class TestIngestion(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, text):
+        with open(self.path, "w") as file:
+            file.write(text)
+
+    def test_parse_sexagesimal(self):
+        self.assertAlmostEqual(ingestion.parse_sexagesimal("23:39: 8.3"),
+                               23 + 39 / 60 + 8.3 / 3600)
+        self.assertAlmostEqual(ingestion.parse_sexagesimal("-12:30:00"),
+                               -12.5)
+        self.assertAlmostEqual(ingestion.parse_sexagesimal("-00:30"), -0.5)
+        self.assertAlmostEqual(ingestion.parse_sexagesimal("+7.25"), 7.25)
+
+    def test_bright_dbf(self):
+        records = list(ingestion.read_dbf_records("stars/dbf/bright.dbf"))
+        self.assertEqual(len(records), 3581)
+        self.assertEqual(records[0]["ALF"], "23:39:8.3")
+        self.assertEqual(records[0]["CO"], "AND")
+
+        stars3d = ingestion.load_dbf_catalog(
+            "stars/dbf/bright.dbf", "stars/")
+        self.assertEqual(len(stars3d), 3581)
+        self.assertIn("Andromeda", stars3d.constellation_names)
+        # Sirius is the brightest star of the catalog
+        self.assertEqual(stars3d.get_tooltip(0),
+                         "Alf: 6:45:8.9\nDel: -16:42:58")
+
+    def test_csv_with_header(self):
+        self.write("ra,dec,mag,sp,bv\n"
+                   "6.0,0,1.5,B2V,\n"
+                   "0,90,0.5,K0,1.6\n"
+                   "broken,0,1,A,0\n")
+        mapping = ingestion.ColumnMapping(
+            ingestion.number_field("ra", 1 / 15),
+            ingestion.number_field("dec"),
+            ingestion.number_field("mag"),
+            ingestion.spectral_field("sp"),
+            color_index=ingestion.optional_number_field("bv"))
+        stars3d, skipped_count = ingestion.ingest_records(
+            ingestion.read_csv_records(self.path), mapping)
+
+        self.assertEqual(skipped_count, 1)
+        self.assertEqual(len(stars3d), 2)
+        self.assertEqual(stars3d.get_point3d(0), Vector3D(0, 0, 1))
+        self.assertEqual(
+            stars3d.get_point3d(1),
+            Vector3D.convert_from_spherical_coordinates(0, 6))
+        self.assertEqual(chr(stars3d.colors[1]), "B")
+        # the colour index decides the class where it is known
+        self.assertEqual(stars3d.color_classes.tolist(), [6, 1])
+
+    def test_mapping_errors_are_raised(self):
+        # only records that cannot be parsed are skipped
+        mapping = ingestion.ColumnMapping(
+            ingestion.number_field("ra"), ingestion.number_field("dec"),
+            lambda record: record.magnitude)
+        with self.assertRaises(AttributeError):
+            ingestion.ingest_records([{"ra": "1", "dec": "2"}], mapping)
+
+    def test_fixed_width(self):
+        self.write(" 2:13:36.3 +51: 3:57  5.31 G8III\n"
+                   "\n"
+                   "23:39: 8.3 -50:28:18  5.30 B9V\n")
+        mapping = ingestion.ColumnMapping(
+            ingestion.sexagesimal_field("alf"),
+            ingestion.sexagesimal_field("del"),
+            ingestion.number_field("mag"),
+            ingestion.spectral_field("sp"),
+            ingestion.constant_field("Andromeda"))
+        stars3d, skipped_count = ingestion.ingest_records(
+            ingestion.read_fixed_width_records(
+                self.path, [("alf", 0, 10), ("del", 11, 20),
+                            ("mag", 21, 26), ("sp", 27, 40)]), mapping)
+
+        self.assertEqual(skipped_count, 0)
+        self.assertEqual(stars3d.get_tooltip(0),
+                         "Alf: 23:39:8.3\nDel: -50:28:18")
+        self.assertEqual(stars3d.get_tooltip(1),
+                         "Alf: 2:13:36.3\nDel: +51:3:57")
+        self.assertEqual(list(stars3d.constellation_names), ["Andromeda"])
+
+    def test_unmapped_color(self):
+        # stars without a spectral column are drawn white
+        self.write("ra,dec,mag\n"
+                   "1.0,20,4.5\n")
+        mapping = ingestion.ColumnMapping(
+            ingestion.number_field("ra"), ingestion.number_field("dec"),
+            ingestion.number_field("mag"))
+        stars3d, _ = ingestion.ingest_records(
+            ingestion.read_csv_records(self.path), mapping)
+        self.assertEqual(stars3d.color_classes.tolist(), [star.UNKNOWN_CLASS])
+
+        image = QtGui.QImage(10, 10, QtGui.QImage.Format_ARGB32)
+        image.fill(0)
+        painter = QtGui.QPainter(image)
+        renderer.draw_stars(
+            painter, numpy.array([[5.0, 5.0]]),
+            numpy.array([renderer.BRIGHTNESS_LEVELS - 1]),
+            stars3d.color_classes, 2)
+        painter.end()
+        self.assertEqual(QtGui.QColor(image.pixel(5, 5)).getRgb()[:3],
+                         (255, 255, 255))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+__author__ = 'borozdin'
+
+import json
+import os
+import tempfile
+import unittest
+from instrumentation import Instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_disabled(self):
+        instrumentation = Instrumentation()
+        with instrumentation.measure("paint"):
+            pass
+        instrumentation.count("stars_visible", 10)
+        self.assertIsNone(instrumentation.get_percentiles("paint"))
+        self.assertEqual(instrumentation.get_report_lines(), [])
+
+    def test_percentiles(self):
+        instrumentation = Instrumentation(True, window_size=100)
+        for duration in range(0, 200):
+            instrumentation.add_timing("paint", 0, duration / 1000)
+        percentiles = instrumentation.get_percentiles("paint", (0, 50, 100))
+        # only the latest window is kept
+        self.assertEqual(percentiles.tolist(), [100, 149.5, 199])
+
+    def test_measure(self):
+        instrumentation = Instrumentation(True)
+        with self.assertRaises(ValueError):
+            with instrumentation.measure("projection"):
+                raise ValueError()
+        instrumentation.count("draw_calls", 3)
+        lines = instrumentation.get_report_lines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("projection: p50 "))
+        self.assertEqual(lines[1], "draw_calls: 3")
+
+    def test_export_trace(self):
+        instrumentation = Instrumentation(True, max_trace_events=3)
+        for index in range(0, 5):
+            with instrumentation.measure("paint"):
+                pass
+        instrumentation.count("stars_visible", 7)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            instrumentation.export_trace(path)
+            with open(path) as file:
+                events = json.load(file)["traceEvents"]
+
+        self.assertEqual([event["ph"] for event in events], ["X", "X", "C"])
+        self.assertEqual(events[-1]["args"], {"stars_visible": 7})
+        self.assertLessEqual(events[0]["ts"], events[1]["ts"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+__author__ = 'borozdin'
+
+import math
+import unittest
+import numpy
+from benchmark import generate_catalog
+from geometry import Vector3D, ViewArea, project_visible_points
+from level_of_detail import LevelOfDetail
+
+
+class TestLevelOfDetail(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stars3d = generate_catalog(200000)
+        cls.level_of_detail = LevelOfDetail(cls.stars3d, max_drawn_stars=2000)
+
+    def test_levels_get_coarser(self):
+        levels = self.level_of_detail.levels
+        self.assertGreater(len(levels), 3)
+        self.assertLess(len(levels[0].indices), len(self.stars3d))
+        for finer, coarser in zip(levels, levels[1:]):
+            self.assertEqual(finer.bands_count, coarser.bands_count * 2)
+            self.assertTrue(numpy.all(
+                numpy.isin(coarser.indices, finer.indices)))
+
+    def test_drawn_stars_are_bounded(self):
+        for view_angle in (0.3, 0.8, math.pi / 2 - 0.01):
+            indices = self.level_of_detail.query(
+                Vector3D(0, 0, 1), view_angle, 10)
+            self.assertLess(len(indices), 4000)
+
+    def test_deep_zoom_uses_whole_catalog(self):
+        self.assertIsNone(self.level_of_detail.get_level(0.05))
+        view_area = ViewArea(Vector3D(1, 0, 0), Vector3D(0, 1, 0), 0.05)
+        self.assertTrue(numpy.array_equal(
+            project_visible_points(self.stars3d, view_area).indices,
+            project_visible_points(
+                self.stars3d, view_area,
+                level_of_detail=self.level_of_detail).indices))
+
+    def test_brightest_stars_are_kept(self):
+        view_area = ViewArea(Vector3D(0, 1, 0), Vector3D(0, 0, 1), 0.3)
+        everything = project_visible_points(self.stars3d, view_area)
+        reduced = project_visible_points(
+            self.stars3d, view_area, level_of_detail=self.level_of_detail)
+        self.assertLess(len(reduced), len(everything))
+        self.assertEqual(everything.indices[:5].tolist(),
+                         reduced.indices[:5].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
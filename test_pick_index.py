@@ -0,0 +1,34 @@
+__author__ = 'borozdin'
+
+import unittest
+import numpy
+from pick_index import PickIndex
+
+
+class TestPickIndex(unittest.TestCase):
+    def test_matches_linear_search(self):
+        generator = numpy.random.RandomState(0)
+        points = generator.uniform(0, 500, size=(3000, 2))
+        index = PickIndex(points, 10)
+
+        for x, y in generator.uniform(-20, 520, size=(500, 2)).tolist():
+            distances = numpy.sqrt(((points - (x, y)) ** 2).sum(axis=1))
+            nearest = index.get_nearest(x, y)
+            if distances.min() > 10:
+                self.assertIsNone(nearest)
+            else:
+                self.assertEqual(nearest, int(numpy.argmin(distances)))
+
+    def test_nearest_not_first(self):
+        index = PickIndex(numpy.array([[0.0, 0.0], [5.0, 0.0], [9.0, 0.0]]),
+                          10)
+        self.assertEqual(index.get_nearest(8, 0), 2)
+        self.assertEqual(index.get_nearest(-3, 0), 0)
+        self.assertIsNone(index.get_nearest(30, 30))
+
+    def test_empty(self):
+        self.assertIsNone(PickIndex(numpy.zeros((0, 2)), 10).get_nearest(0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
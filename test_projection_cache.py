@@ -0,0 +1,103 @@
+__author__ = 'borozdin'
+
+import unittest
+import benchmark
+import incremental_projection
+from projection_cache import ProjectionCache, get_view_key
+from test_projection_worker import make_view_area
+
+
+class TestProjectionCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stars3d = benchmark.generate_catalog(5000)
+
+    def setUp(self):
+        self.projection = incremental_projection.IncrementalProjection(
+            self.stars3d)
+        self.projected = []
+        self.cache = ProjectionCache(self.project, max_entries=3)
+
+    def project(self, view_area):
+        self.projected.append(view_area.view_angle)
+        return self.projection.project(view_area)
+
+    def test_revisited_views(self):
+        view_area = make_view_area()
+        first = self.cache.project(view_area, self.stars3d.version)
+        moves = [(0.01, 0, 0, 0)] * 5 + [(0, 0.02, 0, 0)] * 3
+        for move in moves:
+            view_area.move(*move)
+        for move in reversed(moves):
+            view_area.move(*(-value for value in move))
+        self.assertEqual(get_view_key(view_area),
+                         get_view_key(make_view_area()))
+
+        self.assertIs(self.cache.project(view_area, self.stars3d.version),
+                      first)
+        self.assertEqual(len(self.projected), 1)
+        self.assertEqual((self.cache.hits_count, self.cache.misses_count),
+                         (1, 1))
+
+    def test_keys(self):
+        view_area = make_view_area()
+        self.cache.project(view_area, 0)
+        self.cache.project(view_area, 1)
+        self.cache.project(make_view_area(0.5), 0)
+        moved = make_view_area()
+        moved.move(0, 1e-2, 0, 0)
+        self.cache.project(moved, 0)
+        self.assertEqual(len(self.projected), 4)
+
+    def test_views_closer_than_a_pixel(self):
+        # a pixel of the default screen is about 1.3e-3 at this zoom
+        view_area = make_view_area()
+        first = self.cache.project(view_area)
+        for move in ((0, 1e-4, 0, 0), (1e-4, 0, 0, 0), (0, 0, 1e-4, 0),
+                     (0, 0, 0, 1e-5)):
+            moved = make_view_area()
+            moved.move(*move)
+            self.assertIs(self.cache.project(moved), first)
+        self.assertEqual(len(self.projected), 1)
+
+        # a smaller screen has larger pixels
+        moved = make_view_area()
+        moved.move(0, 2e-3, 0, 0)
+        self.cache.project(moved)
+        self.cache.set_limits(screen_side=10)
+        self.cache.project(view_area)
+        self.assertIs(self.cache.project(moved), self.cache.project(
+            view_area))
+        self.assertEqual(len(self.projected), 3)
+
+    def test_eviction(self):
+        view_areas = [make_view_area(view_angle)
+                      for view_angle in (0.1, 0.2, 0.3, 0.4)]
+        for view_area in view_areas:
+            self.cache.project(view_area)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.evictions_count, 1)
+
+        # the oldest view is gone, the others are kept
+        self.cache.project(view_areas[1])
+        self.cache.project(view_areas[0])
+        self.assertEqual(self.projected, [0.1, 0.2, 0.3, 0.4, 0.1])
+
+    def test_memory_usage(self):
+        stars2d = self.cache.project(make_view_area(1))
+        self.assertGreater(stars2d.get_memory_usage(),
+                           stars2d.points.nbytes)
+        self.assertEqual(self.cache.memory_usage,
+                         stars2d.get_memory_usage())
+
+        last = self.cache.project(make_view_area(0.5))
+        self.cache.set_limits(max_bytes=last.get_memory_usage())
+        self.assertEqual(list(self.cache.entries.values()), [last])
+        self.assertEqual(self.cache.memory_usage, last.get_memory_usage())
+
+        self.cache.clear()
+        self.assertEqual((len(self.cache), self.cache.memory_usage), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+__author__ = 'borozdin'
+
+import math
+import threading
+import unittest
+import geometry
+from projection_worker import ProjectionWorker
+
+
+def make_view_area(view_angle=math.pi / 5):
+    return geometry.ViewArea(geometry.Vector3D(0, 0, 1),
+                             geometry.Vector3D(0, 1, 0), view_angle)
+
+
+class TestProjectionWorker(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.projected = []
+        self.worker = ProjectionWorker(self.project)
+
+    def tearDown(self):
+        self.release.set()
+        self.worker.shutdown()
+
+    def project(self, view_area):
+        self.release.wait()
+        self.projected.append(view_area.view_angle)
+        return view_area.view_angle
+
+    def test_result_is_published(self):
+        self.assertIsNone(self.worker.get_result())
+        self.worker.submit(make_view_area(0.5))
+        self.worker.wait()
+        self.assertEqual(self.worker.get_result(), 0.5)
+
+    def test_view_is_snapshotted(self):
+        self.release.clear()
+        view_area = make_view_area(0.5)
+        self.worker.submit(view_area)
+        view_area.move(0, 0, 0, 0.2)
+        self.release.set()
+        self.worker.wait()
+        self.assertEqual(self.worker.get_result(), 0.5)
+
+    def test_stale_jobs_are_cancelled(self):
+        self.release.clear()
+        for view_angle in (0.1, 0.2, 0.3, 0.4, 0.5):
+            self.worker.submit(make_view_area(view_angle))
+        self.release.set()
+        self.worker.wait()
+
+        self.assertEqual(self.worker.get_result(), 0.5)
+        self.assertEqual(self.worker.jobs_count, 5)
+        self.assertLessEqual(len(self.projected), 2)
+        self.assertEqual(self.projected[-1], 0.5)
+        self.assertEqual(self.worker.cancelled_count, 4)
+
+    def test_project_now(self):
+        self.worker.project_now(make_view_area(0.3))
+        self.assertEqual(self.worker.get_result(), 0.3)
+        self.worker.submit(make_view_area(0.4))
+        self.worker.wait()
+        self.assertEqual(self.worker.get_result(), 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
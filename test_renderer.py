@@ -0,0 +1,85 @@
+__author__ = 'borozdin'
+
+import unittest
+import numpy
+from PyQt5 import QtGui
+import benchmark
+import geometry
+import renderer
+import star
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.image = QtGui.QImage(100, 100, QtGui.QImage.Format_ARGB32)
+        self.image.fill(0)
+        self.painter = QtGui.QPainter(self.image)
+
+    def tearDown(self):
+        if self.painter.isActive():
+            self.painter.end()
+
+    def test_make_polygon(self):
+        polygon = renderer.make_polygon(numpy.array([[1.5, 2], [3, 4.25]]))
+        self.assertEqual([(point.x(), point.y()) for point in polygon],
+                         [(1.5, 2), (3, 4.25)])
+        self.assertEqual(renderer.make_polygon(numpy.zeros((0, 2))).size(), 0)
+        # single precision and strided points are converted first
+        points = numpy.array([[1.5, 0, 2], [3, 0, 4.25]], dtype=numpy.float32)
+        polygon = renderer.make_polygon(points[:, ::2])
+        self.assertEqual([(point.x(), point.y()) for point in polygon],
+                         [(1.5, 2), (3, 4.25)])
+
+    def test_brightness_levels(self):
+        levels = renderer.get_brightness_levels(
+            numpy.array([5, 3, 1]), 5, 1)
+        self.assertEqual(levels.tolist(),
+                         [0, renderer.BRIGHTNESS_LEVELS // 2,
+                          renderer.BRIGHTNESS_LEVELS - 1])
+        self.assertEqual(renderer.get_visible_brightness(0), 50)
+        self.assertEqual(renderer.get_visible_brightness(
+            renderer.BRIGHTNESS_LEVELS - 1), 255)
+
+    def test_star_levels(self):
+        stars3d = benchmark.generate_catalog(5000)
+        view_area = geometry.ViewArea(geometry.Vector3D(0, 0, 1),
+                                      geometry.Vector3D(0, 1, 0), 1)
+        stars2d = geometry.project_visible_points(stars3d, view_area)
+        threshold = view_area.get_brightness_threshold()
+        levels = renderer.get_star_levels(stars2d, threshold)
+        # magnitude steps are finer than brightness levels
+        self.assertLessEqual(numpy.abs(levels - renderer.get_brightness_levels(
+            stars2d.brightness, threshold, stars2d.brightness.min())).max(),
+            1)
+        self.assertEqual(len(renderer.get_star_levels(
+            star.ProjectedStars(stars3d, numpy.zeros(0, dtype=int),
+                                numpy.zeros((0, 2))), threshold)), 0)
+
+    def test_one_draw_call_per_bucket(self):
+        generator = numpy.random.RandomState(0)
+        points = generator.uniform(10, 90, size=(1000, 2))
+        levels = generator.randint(0, renderer.BRIGHTNESS_LEVELS, 1000)
+        color_classes = numpy.array([1, 5, 6] * 333 + [1], dtype=numpy.uint8)
+        draw_calls = renderer.draw_stars(
+            self.painter, points, levels, color_classes, 2)
+        self.assertLessEqual(draw_calls, 3 * renderer.BRIGHTNESS_LEVELS)
+
+    def test_stars_are_drawn(self):
+        draw_calls = renderer.draw_stars(
+            self.painter, numpy.array([[20.0, 30.0], [70.0, 70.0]]),
+            numpy.array([renderer.BRIGHTNESS_LEVELS - 1] * 2),
+            star.get_color_classes(numpy.array([ord("M"), ord("A")])), 2)
+        renderer.draw_selection(
+            self.painter, numpy.array([[50.0, 50.0]]), 10)
+        self.painter.end()
+
+        self.assertEqual(draw_calls, 2)
+        self.assertEqual(QtGui.QColor(self.image.pixel(20, 30)).red(), 255)
+        self.assertEqual(QtGui.QColor(self.image.pixel(20, 30)).blue(), 0)
+        self.assertEqual(QtGui.QColor(self.image.pixel(70, 70)).blue(), 255)
+        self.assertEqual(QtGui.QColor(self.image.pixel(45, 50)).red(), 255)
+        self.assertEqual(self.image.pixel(50, 50), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+__author__ = 'borozdin'
+
+import unittest
+import parser
+import search_index
+from search_index import Entry, SearchIndex, get_prefix_distance
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex([
+            (Entry("Orion", "Orion"), ["Orion"]),
+            (Entry("Andromeda", "Andromeda"), ["Andromeda"]),
+            (Entry("Alp And", "Andromeda", 0, 1),
+             ["Alp And", "Alpha And", "Alp Andromeda", "HD 358"]),
+            (Entry("Bet Ori", "Orion", 1, 2),
+             ["Bet Ori", "Beta Ori", "Bet Orion", "HD 34085"]),
+            (Entry("54 Ori", "Orion", 2, 3), ["54 Ori", "54 Orion"]),
+        ])
+
+    def search(self, text):
+        return [entry.text for entry in self.index.search(text)]
+
+    def test_prefix(self):
+        self.assertEqual(self.search("or"), ["Orion", "Bet Ori", "54 Ori"])
+        self.assertEqual(self.search("  ALPHA  a"), ["Alp And"])
+        self.assertEqual(self.search("hd"), ["Alp And", "Bet Ori"])
+        self.assertEqual(self.search(""), [])
+
+    def test_exact_goes_first(self):
+        self.assertEqual(self.search("andromeda"), ["Andromeda", "Alp And"])
+        self.assertEqual(self.search("54 ori"), ["54 Ori"])
+
+    def test_words_and_substrings(self):
+        self.assertEqual(self.search("ori"),
+                         ["Orion", "Bet Ori", "54 Ori"])
+        self.assertEqual(self.search("085"), ["Bet Ori"])
+
+    def test_fuzzy(self):
+        self.assertEqual(self.search("andromda"), ["Andromeda", "Alp And"])
+        self.assertEqual(self.search("orin"), ["Orion", "Bet Ori", "54 Ori"])
+        self.assertEqual(self.search("betta orio"), ["Bet Ori"])
+        self.assertEqual(self.search("qwerty"), [])
+
+    def test_find(self):
+        self.assertEqual(self.index.find("bet"), Entry("", "Orion", 1))
+        self.assertIsNone(self.index.find("qwerty"))
+
+    def test_prefix_distance(self):
+        self.assertEqual(get_prefix_distance("andromda", "andromeda"), 1)
+        self.assertEqual(get_prefix_distance("orio", "orion"), 0)
+        self.assertEqual(get_prefix_distance("orion", "or"), 3)
+
+
+class TestCatalogSearchIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = parser.parse_catalog("stars/")
+        cls.index = search_index.build_search_index(cls.catalog, "stars/")
+
+    def test_designations(self):
+        designations = list(parser.parse_file_designations(
+            "stars/", "ori.txt"))
+        self.assertEqual(
+            [designation[:2] + designation[3:]
+             for designation in designations[:2]],
+            [("Orion", "Ori", "39587", "54", "Chi1"),
+             ("Orion", "Ori", "39698", "57", "")])
+
+    def test_stars(self):
+        for text in ("Chi1 Ori", "chi1 orion", "54 Ori", "HD 39587",
+                     "hd39587"):
+            entry = self.index.find(text)
+            self.assertEqual(entry.text, "Chi1 Ori (HD 39587)")
+            self.assertEqual(self.catalog.get_tooltip(entry.star_index),
+                             "Alf: 5:54:22.9\nDel: +20:16:34")
+
+    def test_constellations(self):
+        for name in self.catalog.constellation_names:
+            entry = self.index.find(name)
+            self.assertEqual(entry.constellation, name)
+            self.assertIsNone(entry.star_index)
+
+
+if __name__ == '__main__':
+    unittest.main()
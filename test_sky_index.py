@@ -0,0 +1,73 @@
+__author__ = 'borozdin'
+
+import unittest
+import math
+import numpy
+from geometry import Vector3D
+from sky_index import SkyIndex, search_cutoffs
+
+
+def generate_points(count, seed=0):
+    generator = numpy.random.RandomState(seed)
+    points = generator.normal(size=(count, 3))
+    return points / numpy.sqrt((points ** 2).sum(axis=1))[:, numpy.newaxis]
+
+
+class TestSkyIndex(unittest.TestCase):
+    def setUp(self):
+        self.points = generate_points(20000)
+        self.brightness = numpy.random.RandomState(2).uniform(-1, 7, 20000)
+        self.index = SkyIndex(self.points, self.brightness)
+
+    def assert_contains_view_cone(self, view_vector3d, view_angle):
+        view_vector = numpy.array(
+            (view_vector3d.x, view_vector3d.y, view_vector3d.z))
+        expected = numpy.flatnonzero(
+            self.points @ view_vector >= math.cos(view_angle))
+        candidates = self.index.query(view_vector3d, view_angle)
+        self.assertTrue(numpy.all(numpy.diff(candidates) > 0))
+        self.assertTrue(numpy.all(numpy.isin(expected, candidates)))
+        return candidates
+
+    def test_random_views(self):
+        for point in generate_points(50, 1):
+            for view_angle in (0.01, 0.1, 0.5, math.pi / 2 - 0.01):
+                self.assert_contains_view_cone(Vector3D(*point), view_angle)
+
+    def test_poles_and_date_line(self):
+        for view_vector3d in (Vector3D(0, 0, 1), Vector3D(0, 0, -1),
+                              Vector3D(-1, 0, 0), Vector3D(-1, 1e-9, 0.3),
+                              Vector3D(1, 0, 0)):
+            for view_angle in (0.01, 0.3, 1.5):
+                self.assert_contains_view_cone(
+                    view_vector3d.normalize(), view_angle)
+
+    def test_small_view_touches_few_stars(self):
+        candidates = self.assert_contains_view_cone(Vector3D(1, 0, 0), 0.01)
+        self.assertLess(len(candidates), len(self.points) / 100)
+
+    def test_brightness_threshold(self):
+        view_vector3d = Vector3D(0.3, -0.4, 0.5).normalize()
+        all_candidates = self.index.query(view_vector3d, 0.4)
+        for threshold in (-2, 0, 3.5, 10):
+            candidates = self.index.query(view_vector3d, 0.4, threshold)
+            self.assertTrue(numpy.array_equal(
+                candidates,
+                all_candidates[self.brightness[all_candidates] <= threshold]))
+
+    def test_search_cutoffs(self):
+        values = numpy.array([1, 2, 2, 5, 0, 3, 4, 4, 7], dtype=float)
+        starts = numpy.array([0, 4, 4, 8])
+        ends = numpy.array([4, 8, 4, 9])
+        self.assertEqual(
+            search_cutoffs(values, starts, ends, 2).tolist(), [3, 5, 4, 8])
+        self.assertEqual(
+            search_cutoffs(values, starts, ends, 10).tolist(), [4, 8, 4, 9])
+
+    def test_empty(self):
+        index = SkyIndex(numpy.zeros((0, 3)), numpy.zeros(0))
+        self.assertEqual(len(index.query(Vector3D(0, 0, 1), 1, 5)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
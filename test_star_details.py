@@ -0,0 +1,81 @@
+__author__ = 'borozdin'
+
+import unittest
+import parser
+import star_details
+from star_details import StarDetails, parse_details, strip_tags
+
+
+class TestStarDetails(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = parser.parse_catalog("stars/")
+
+    def setUp(self):
+        self.details = StarDetails(self.catalog, "stars/", cache_size=2)
+
+    def find(self, constellation, right_ascension, declination):
+        return self.catalog.find_star(
+            self.catalog.get_constellation_id(constellation),
+            (right_ascension, declination))
+
+    def test_strip_tags(self):
+        self.assertEqual(
+            strip_tags(b"</font>&nbsp;35 23:39: 8.3&nbsp; <b>x</b>\r\n"),
+            " 35 23:39: 8.3  x")
+
+    def test_parse_details(self):
+        fields = parse_details(
+            "136  5:55:49.3 +20:10:30 188.72 -02.49  V 5.4    M6.5IIIe"
+            "            0.000 -0.014       -021  39816        ")
+        self.assertEqual(fields["magnitude"], "5.4")
+        self.assertEqual(fields["type"], "V")
+        self.assertEqual(fields["spectrum"], "M6.5IIIe")
+        self.assertEqual(fields["proper_motion"], ("0.000", "-0.014"))
+        self.assertEqual(fields["hd"], "39816")
+        self.assertEqual(fields["bayer"], "")
+        self.assertEqual(fields["note"], "")
+
+    def test_lazy_loading(self):
+        self.assertFalse(self.details.offsets)
+        index = self.find("Orion", 5 * 36000 + 54 * 600 + 229,
+                          20 * 3600 + 16 * 60 + 34)
+        self.assertEqual(
+            self.details.get_text(index).split("\n"),
+            ["Alf: 5:54:22.9", "Del: +20:16:34", "54 Chi1 Orion",
+             "HD 39587", "m: 4.41  double", "Sp: G0V",
+             "l: 188.46  b: -02.73", "Proper motion: -0.189 -0.084 \"/year",
+             "Vr: -014 km/s"])
+        self.assertEqual(self.details.indexed_pages, {"ori.htm"})
+        self.assertGreater(len(self.details.offsets), 10)
+
+    def test_notes(self):
+        index = self.find("Bootes", 14 * 36000 + 15 * 600 + 397,
+                          19 * 3600 + 10 * 60 + 57)
+        fields = self.details.get_fields(index)
+        self.assertEqual(fields["bayer"], "Alp")
+        self.assertEqual(fields["note_text"], "ARCTURUS; Haris-el-sema.")
+
+    def test_cache(self):
+        self.details.find_line(0)
+        indices = sorted(self.details.offsets)[:3]
+        for index in indices + indices[-1:] + indices[:1]:
+            self.details.get_fields(index)
+        self.assertEqual(self.details.misses_count, 4)
+        self.assertEqual(self.details.hits_count, 1)
+        self.assertEqual(list(self.details.cache), [indices[2], indices[0]])
+
+    def test_stars_without_details(self):
+        index = next(index for index in range(0, len(self.catalog))
+                     if self.details.find_line(index) is None)
+        self.assertEqual(self.details.get_text(index),
+                         self.catalog.get_tooltip(index))
+
+    def test_page_files(self):
+        pages = star_details.get_page_files("stars/")
+        self.assertIn("ori.htm", pages)
+        self.assertEqual(len(pages), len(set(pages)))
+
+
+if __name__ == '__main__':
+    unittest.main()